@@ -0,0 +1,99 @@
+"""Enrollment aggregates computed from a snapshot (see courseinfo.snapshot).
+
+Every function takes the tables load_snapshot() returns and answers
+with whole-array operations: counts are np.bincount() over the integer
+codes, so no function loops over registrations in Python. Results are
+columnar too, as {column: array}, one row per section, semester or
+instructor in the order of that dictionary table.
+"""
+import numpy as np
+
+from courseinfo.snapshot import UNLIMITED
+
+
+def enrollment_per_section(snapshot):
+    sections = snapshot['sections']
+    return np.bincount(snapshot['registrations']['section'], minlength=len(sections['section_id']))
+
+
+def fill_rates(snapshot):
+    """Registrations and fill rate of every section.
+
+    fill_rate is enrolled / capacity, NaN for a section with no seat
+    limit (or no seats).
+    """
+    sections = snapshot['sections']
+    enrolled = enrollment_per_section(snapshot)
+    capacity = np.asarray(sections['capacity'])
+    limited = capacity > 0
+    fill_rate = np.full(len(capacity), np.nan)
+    np.divide(enrolled, capacity, out=fill_rate, where=limited)
+    return {
+        'section_id': np.asarray(sections['section_id']),
+        'enrolled': enrolled,
+        'capacity': capacity,
+        'fill_rate': fill_rate,
+    }
+
+
+def semester_totals(snapshot):
+    """Sections, registrations, distinct students and fill rate of every semester.
+
+    seats counts the sections with a seat limit only, and fill_rate is
+    the registrations in those sections over their seats.
+    """
+    semesters = snapshot['semesters']
+    sections = snapshot['sections']
+    registrations = snapshot['registrations']
+    size = len(semesters['semester_id'])
+    capacity = np.asarray(sections['capacity'])
+    limited = capacity != UNLIMITED
+    enrolled = enrollment_per_section(snapshot)
+    seats = np.bincount(sections['semester'][limited], weights=capacity[limited], minlength=size)
+    seated = np.bincount(sections['semester'][limited], weights=enrolled[limited], minlength=size)
+    fill_rate = np.full(size, np.nan)
+    np.divide(seated, seats, out=fill_rate, where=seats > 0)
+    return {
+        'semester_id': np.asarray(semesters['semester_id']),
+        'year': np.asarray(semesters['year']),
+        'period_name': np.asarray(semesters['period_name']),
+        'sections': np.bincount(sections['semester'], minlength=size),
+        'registrations': np.bincount(registrations['semester'], minlength=size),
+        'students': distinct_per_group(registrations['semester'], registrations['student'], size),
+        'seats': seats.astype(np.int64),
+        'fill_rate': fill_rate,
+    }
+
+
+def instructor_loads(snapshot, semester_id=None):
+    """Sections, distinct courses and registrations taught by every instructor.
+
+    With semester_id, only that semester's sections count.
+    """
+    instructors = snapshot['instructors']
+    sections = snapshot['sections']
+    registrations = snapshot['registrations']
+    size = len(instructors['instructor_id'])
+    section_rows = np.ones(len(sections['section_id']), dtype=bool)
+    registration_rows = np.ones(len(registrations['section']), dtype=bool)
+    if semester_id is not None:
+        semester = np.flatnonzero(np.asarray(snapshot['semesters']['semester_id']) == semester_id)
+        if not len(semester):
+            raise ValueError('The snapshot has no semester %s.' % semester_id)
+        section_rows = sections['semester'] == semester[0]
+        registration_rows = registrations['semester'] == semester[0]
+    instructor = sections['instructor'][section_rows]
+    return {
+        'instructor_id': np.asarray(instructors['instructor_id']),
+        'sections': np.bincount(instructor, minlength=size),
+        'courses': distinct_per_group(instructor, sections['course'][section_rows], size),
+        'registrations': np.bincount(registrations['instructor'][registration_rows], minlength=size),
+    }
+
+
+def distinct_per_group(groups, values, size):
+    """Count the distinct values in each group, for groups coded 0..size - 1."""
+    # one int64 per (group, value) pair, so np.unique() drops the repeats
+    width = int(np.max(values, initial=0)) + 1
+    pairs = np.unique(np.asarray(groups, dtype=np.int64) * width + values)
+    return np.bincount(pairs // width, minlength=size)
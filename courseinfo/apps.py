@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CourseinfoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courseinfo'
+
+    def ready(self):
+        from courseinfo import signals  # noqa: F401
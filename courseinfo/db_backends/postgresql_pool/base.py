@@ -0,0 +1,71 @@
+"""PostgreSQL backend that draws its connections from a process-wide pool.
+
+Use ENGINE 'courseinfo.db_backends.postgresql_pool' with CONN_MAX_AGE 0:
+Django then "closes" its connection at the end of every request, which
+hands it back to the pool instead of hanging up. OPTIONS['pool'] sets the
+ConnectionPool arguments (max_size, max_lifetime, max_idle, timeout);
+the rest of OPTIONS goes to psycopg2 as usual.
+"""
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base
+
+from courseinfo.pool import ConnectionPool, get_pool
+
+
+def _connect(conn_params):
+    connection = psycopg2.connect(**conn_params)
+    # as in Django's own backend: skip decoding jsonb just to re-encode it
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def _check(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _reset(connection):
+    if connection.closed:
+        raise psycopg2.InterfaceError('connection already closed')
+    if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    connection.autocommit = True
+
+
+def _pool_key(alias, conn_params):
+    # keyed on the parameters too: the test runner connects the same alias
+    # to the ``postgres`` database while it creates the test database
+    return ('postgresql', alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        self.pool = get_pool(_pool_key(self.alias, conn_params), lambda: ConnectionPool(
+            lambda: _connect(conn_params), _check, _reset,
+            name='%s (%s)' % (self.alias, conn_params.get('database', '')),
+            **options.get('pool', {})
+        ))
+        connection = self.pool.getconn()
+        # what Django's backend does after connecting, for a reused connection too
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.putconn(self.connection, discard=self.connection.closed != 0)
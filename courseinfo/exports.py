@@ -0,0 +1,89 @@
+"""Streaming CSV and JSON Lines exports of courseinfo data.
+
+Rows are read with values_list() through QuerySet.iterator(), so no
+model instances are built and memory use stays flat however many rows
+are exported. The columns a registration record needs are the ones
+courseinfo.imports reads back, so an export can be imported again.
+"""
+import csv
+import json
+
+from courseinfo.models import Registration
+
+# (column, lookup) for every exported registration column
+REGISTRATION_COLUMNS = (
+    ('last_name', 'student__last_name'),
+    ('first_name', 'student__first_name'),
+    ('disambiguator', 'student__disambiguator'),
+    ('course_number', 'section__course__course_number'),
+    ('course_name', 'section__course__course_name'),
+    ('section_name', 'section__section_name'),
+    ('year', 'section__semester__year__year'),
+    ('period', 'section__semester__period__period_name'),
+    ('instructor_last_name', 'section__instructor__last_name'),
+    ('instructor_first_name', 'section__instructor__first_name'),
+    ('instructor_disambiguator', 'section__instructor__disambiguator'),
+)
+# the query parameters and command options an export is filtered on
+REGISTRATION_FILTERS = {
+    'semester': 'section__semester_id',
+    'course': 'section__course_id',
+    'section': 'section_id',
+}
+CHUNK_SIZE = 2000
+
+
+def registration_rows(semester=None, course=None, section=None):
+    """Return a values_list() of every REGISTRATION_COLUMNS row, in sort_key order.
+
+    semester, course and section are primary keys; each one given
+    narrows the export to the registrations of that semester, course or
+    section.
+    """
+    filters = {
+        REGISTRATION_FILTERS[name]: value
+        for name, value in (('semester', semester), ('course', course), ('section', section))
+        if value is not None
+    }
+    ordering = ['sort_key']
+    if section is None and (semester is not None or course is not None):
+        # the same order (a registration's sort_key starts with its
+        # section's), but walked section by section through the
+        # (semester|course, sort_key) index, so only one section's
+        # registrations are sorted at a time
+        ordering.insert(0, 'section__sort_key')
+    return Registration.objects.filter(**filters).order_by(*ordering).values_list(
+        *(lookup for _, lookup in REGISTRATION_COLUMNS)
+    )
+
+
+class Echo:
+    """A file-like object whose write() returns what it was given, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    """Yield the header and then one CSV line per row."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def jsonl_lines(columns, rows):
+    """Yield one JSON object per row, one per line."""
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield json.dumps(dict(zip(columns, row))) + '\n'
+
+
+# format: (content type, line generator)
+FORMATS = {
+    'csv': ('text/csv', csv_lines),
+    'jsonl': ('application/x-ndjson', jsonl_lines),
+}
+
+
+def export_lines(file_format, columns, rows):
+    return FORMATS[file_format][1]([column for column, _ in columns], rows)
@@ -1,5 +1,97 @@
 from django import forms
-from courseinfo.models import Instructor, Section, Student, Course, Registration, Semester
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+
+from courseinfo.generations import get_generations
+from courseinfo.models import Instructor, Section, Student, Course, Registration, Semester, Year, Period
+
+
+class AutocompleteWidget(forms.TextInput):
+    """Text input for a foreign key filled in from an autocomplete endpoint.
+
+    Unlike a Select it never renders the whole table; only the current
+    value's label is looked up.
+    """
+    template_name = 'courseinfo/widgets/autocomplete.html'
+
+    class Media:
+        js = ['courseinfo/autocomplete.js']
+
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        options_id = '%s_options' % context['widget']['attrs'].get('id', name)
+        context['widget']['attrs'].update({
+            'list': options_id,
+            'data-autocomplete-url': reverse(self.url_name),
+            'autocomplete': 'off',
+        })
+        context['widget']['options_id'] = options_id
+        context['widget']['selected'] = self.selected_object(value)
+        return context
+
+    def selected_object(self, value):
+        # ModelChoiceField hands its queryset to the widget as choices
+        choices = getattr(self, 'choices', None)
+        if value in (None, '') or choices is None:
+            return None
+        try:
+            return choices.queryset.filter(pk=value).first()
+        except (TypeError, ValueError):
+            return None
+
+
+# Rendered (value, label) pairs of the cached option lists, per process,
+# each with the model generations it was built from.
+_option_lists = {}
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    def options(self):
+        name = self.field.option_list
+        generations = get_generations(self.field.option_models)
+        entry = _option_lists.get(name)
+        if entry is None or entry[0] != generations:
+            options = [(obj.pk, self.field.label_from_instance(obj)) for obj in self.queryset]
+            entry = (generations, options)
+            _option_lists[name] = entry
+        return entry[1]
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from self.options()
+
+    def __len__(self):
+        return len(self.options()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.options())
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField whose <option> list is built once per process.
+
+    ``option_list`` names the entry and ``option_models`` are the models
+    its labels come from; the list is rebuilt whenever the generation
+    of any of them changes.
+    """
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, queryset, option_list, option_models=None, **kwargs):
+        self.option_list = option_list
+        self.option_models = option_models or (queryset.model,)
+        super().__init__(queryset, **kwargs)
+
+
+def normalize_disambiguator(value):
+    # an eight-character disambiguator is kept exactly as entered
+    if len(value) == 8:
+        return value
+    return value.strip()
 
 
 class InstructorForm(forms.ModelForm):
@@ -14,17 +106,20 @@ class InstructorForm(forms.ModelForm):
         return self.cleaned_data['last_name'].strip()
 
     def clean_disambiguator(self):
-        if len(self.cleaned_data['disambiguator']) == 8:
-            result = self.cleaned_data['disambiguator']
-        else:
-            result = self.cleaned_data['disambiguator'].strip()
-        return result
+        return normalize_disambiguator(self.cleaned_data['disambiguator'])
 
 
 class SectionForm(forms.ModelForm):
+    semester = CachedModelChoiceField(Semester.objects.select_related('year', 'period'), option_list='semester',
+                                      option_models=(Semester, Year, Period))
+    course = CachedModelChoiceField(Course.objects.all(), option_list='course')
+
     class Meta:
         model = Section
         fields = '__all__'
+        widgets = {
+            'instructor': AutocompleteWidget('courseinfo_instructor_autocomplete_urlpattern'),
+        }
 
     def clean_section_name(self):
         return self.cleaned_data['section_name'].strip()
@@ -42,11 +137,7 @@ class StudentForm(forms.ModelForm):
         return self.cleaned_data['last_name'].strip()
 
     def clean_disambiguator(self):
-        if len(self.cleaned_data['disambiguator']) == 8:
-            result = self.cleaned_data['disambiguator']
-        else:
-            result = self.cleaned_data['disambiguator'].strip()
-        return result
+        return normalize_disambiguator(self.cleaned_data['disambiguator'])
 
 
 class CourseForm(forms.ModelForm):
@@ -65,6 +156,35 @@ class RegistrationForm(forms.ModelForm):
     class Meta:
         model = Registration
         fields = '__all__'
+        widgets = {
+            'student': AutocompleteWidget('courseinfo_student_autocomplete_urlpattern'),
+            'section': AutocompleteWidget('courseinfo_section_autocomplete_urlpattern'),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['section'].queryset = Section.objects.with_related()
+
+
+class BulkRegistrationForm(forms.Form):
+    section = forms.ModelChoiceField(
+        queryset=Section.objects.with_related(),
+        widget=AutocompleteWidget('courseinfo_section_autocomplete_urlpattern'),
+    )
+    student_ids = forms.CharField(
+        widget=forms.Textarea,
+        help_text='Student IDs separated by commas, spaces or new lines.',
+    )
+
+    def clean_student_ids(self):
+        values = self.cleaned_data['student_ids'].replace(',', ' ').split()
+        try:
+            result = [int(value) for value in values]
+        except ValueError:
+            raise forms.ValidationError('Student IDs must be whole numbers.')
+        if not result:
+            raise forms.ValidationError('Enter at least one student ID.')
+        return result
 
 
 class SemesterForm(forms.ModelForm):
@@ -0,0 +1,75 @@
+"""Per-model generation numbers kept in the shared Django cache.
+
+Every change to a model's rows bumps its generation, and anything cached
+from those rows is stored under a key that includes the generations it
+was built from (see versioned_key()). A bump therefore makes the old
+entries unreachable in every worker process at once, with nothing to
+delete and no process-local state to go stale.
+
+Generations are only read and written through the ``default`` cache, so
+the backend has to be shared between the workers (file-based, database,
+memcached or redis). The file-based and database backends implement
+incr() as a read followed by a write, so instead of counting up from
+zero a bump stores max(old + 1, time.time_ns()): two workers bumping at
+once can each win the race, but neither can put back a value that an
+earlier entry was keyed on.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def generation_key(model):
+    return 'courseinfo:generation:%s' % model._meta.label_lower
+
+
+def get_generations(models):
+    """Return the current generation of each model, in order.
+
+    A model with no generation in the cache (never bumped, culled or
+    lost in a restart) is given a fresh time-based one, which cannot
+    match anything cached before.
+    """
+    keys = [generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        found.update(cache.get_many(missing))
+    return [found[key] for key in keys]
+
+
+def get_generation(model):
+    return get_generations([model])[0]
+
+
+def bump_generation(*models):
+    keys = [generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    now = time.time_ns()
+    cache.set_many({key: max(found.get(key, 0) + 1, now) for key in keys}, None)
+
+
+def bump_generation_on_commit(*models):
+    """Bump the models' generations once the current transaction commits.
+
+    Bumping earlier would let a concurrent request render the old rows
+    and cache them under the new generation.
+    """
+    transaction.on_commit(partial(bump_generation, *models))
+
+
+def versioned_key(prefix, models, *parts):
+    """Build a cache key that changes whenever any of the models changes.
+
+    ``parts`` are further strings the entry depends on (a path, a
+    permission fingerprint). Everything but the prefix is hashed, so the
+    key stays short enough for any backend.
+    """
+    generations = [str(generation) for generation in get_generations(models)]
+    digest = hashlib.sha1('\n'.join(generations + list(parts)).encode()).hexdigest()
+    return 'courseinfo:%s:%s' % (prefix, digest)
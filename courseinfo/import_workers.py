@@ -0,0 +1,110 @@
+"""The parsing half of the registration import pipeline.
+
+These functions run in worker processes. The module imports nothing
+from Django at the top so that spawned workers can unpickle it before
+start_worker() has set Django up; the lookup dictionaries are handed
+over once per worker and every chunk is resolved against them without
+touching the database.
+"""
+import csv
+import json
+
+_lookups = None
+
+REQUIRED_FIELDS = ('last_name', 'first_name', 'course_number', 'section_name', 'year', 'period')
+
+
+def start_worker(lookups):
+    global _lookups
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    _lookups = lookups
+
+
+def parse_lines(file_format, fieldnames, first_line, lines):
+    """Yield (line number, record, error) for a chunk of raw lines.
+
+    Every CSV record has to fit on one line; quoted newlines are not
+    supported. Each line is read on its own, strictly, so a malformed
+    line (an unterminated quote, say) is rejected without running into
+    the lines after it.
+    """
+    if file_format == 'csv':
+        for number, line in enumerate(lines, first_line):
+            try:
+                values = next(csv.reader([line], strict=True), [])
+            except csv.Error as error:
+                yield number, None, 'not valid CSV (%s)' % error
+                continue
+            if values:
+                yield number, dict(zip(fieldnames, values)), None
+        return
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as error:
+            yield number, None, 'not valid JSON (%s)' % error
+
+
+def resolve(record, lookups):
+    """Return (section_id, student_id, sort_key) for one record, or raise RowError."""
+    from courseinfo.imports import RowError, normalize_person
+    from courseinfo.models import Student, make_sort_key
+
+    if not isinstance(record, dict):
+        raise RowError('not an object')
+    for name in REQUIRED_FIELDS:
+        if not str(record.get(name) or '').strip():
+            raise RowError('%s is required' % name)
+    student = normalize_person(Student, record)
+    course_number = str(record['course_number']).strip()
+    section_name = str(record['section_name']).strip()
+    period = str(record['period']).strip()
+    try:
+        year = int(record['year'])
+    except (TypeError, ValueError):
+        raise RowError('year %r is not a number' % record['year'])
+    semester_id = lookups['semesters'].get((year, period))
+    if semester_id is None:
+        raise RowError('no semester %s %s' % (year, period))
+    section = lookups['sections'].get((semester_id, course_number, section_name))
+    if section is None:
+        raise RowError('no section %s %s in %s %s' % (course_number, section_name, year, period))
+    student_id = lookups['students'].get(student)
+    if student_id is None:
+        raise RowError('no student %s, %s (%s)' % student)
+    section_id, section_sort_key = section
+    return section_id, student_id, make_sort_key(section_sort_key, *student)
+
+
+def parse_chunk(file_format, fieldnames, first_line, lines, lookups=None):
+    """Parse, validate and resolve a chunk of raw lines.
+
+    Returns (rows, rejects, duplicates): the (section_id, student_id,
+    sort_key) of every distinct registration in the chunk, the
+    (line number, reason, line) of every record that could not be
+    resolved, and how many records repeated an earlier one.
+    """
+    from courseinfo.imports import RowError
+
+    lookups = lookups or _lookups
+    rows = {}
+    rejects = []
+    duplicates = 0
+    for number, record, error in parse_lines(file_format, fieldnames, first_line, lines):
+        if error is None:
+            try:
+                section_id, student_id, sort_key = resolve(record, lookups)
+            except RowError as row_error:
+                error = str(row_error)
+        if error is not None:
+            rejects.append((number, error, lines[number - first_line].rstrip('\r\n')))
+        elif (section_id, student_id) in rows:
+            duplicates += 1
+        else:
+            rows[section_id, student_id] = sort_key
+    return [key + (sort_key,) for key, sort_key in rows.items()], rejects, duplicates
@@ -0,0 +1,295 @@
+"""Bulk loading of courseinfo data from CSV and JSON Lines files.
+
+Records are read one at a time and written in chunks, one transaction
+per chunk, so memory use is bounded by the chunk size however large
+the file is. Registration records are parsed and resolved in worker
+processes (see courseinfo.import_workers) and written by this process
+alone.
+"""
+import csv
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.db import IntegrityError, connection, transaction
+
+from courseinfo.forms import normalize_disambiguator
+from courseinfo.generations import bump_generation_on_commit
+from courseinfo.import_workers import parse_chunk, start_worker
+from courseinfo.models import Registration, Section, Semester, Student
+from courseinfo.search import fts_available, insert_fts_rows
+from courseinfo.services import create_registrations, recount_enrollments
+from courseinfo.utils import adjust_cached_count
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+PERSON_FIELDS = ('last_name', 'first_name', 'disambiguator')
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path):
+    for suffix, file_format in FORMATS.items():
+        if str(path).lower().endswith(suffix):
+            return file_format
+    raise ValueError('Cannot tell the format of %s; name it .csv or .jsonl.' % path)
+
+
+def read_records(path, file_format):
+    """Yield (line number, record, error) for every record in the file.
+
+    A record is a dict of strings for CSV (with a header row) and
+    whatever the line holds for JSON Lines. A JSON line that does not
+    parse is yielded with record None and the error message.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        if file_format == 'csv':
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line), None
+            except ValueError as error:
+                yield number, None, 'not valid JSON (%s)' % error
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def normalize_person(model, record):
+    """Return the (last_name, first_name, disambiguator) StudentForm or InstructorForm would save.
+
+    Like the forms, every value is stripped (forms.CharField does that
+    before any clean_<field>() runs) and the disambiguator then goes
+    through normalize_disambiguator(). Raises RowError for a record the
+    form would reject.
+    """
+    if not isinstance(record, dict):
+        raise RowError('not an object')
+    values = []
+    for name in PERSON_FIELDS:
+        value = record.get(name) or ''
+        if not isinstance(value, str):
+            raise RowError('%s is not text' % name)
+        value = value.strip()
+        if name == 'disambiguator':
+            value = normalize_disambiguator(value)
+        elif not value:
+            raise RowError('%s is required' % name)
+        max_length = model._meta.get_field(name).max_length
+        if len(value) > max_length:
+            raise RowError('%s is longer than %s characters' % (name, max_length))
+        values.append(value)
+    return tuple(values)
+
+
+def existing_people(model, keys):
+    """Return which of the (last_name, first_name, disambiguator) keys are already stored.
+
+    Two IN lists narrow the lookup to the leading columns of the
+    unique_student/unique_instructor index; the exact matches are picked
+    out here.
+    """
+    stored = model.objects.filter(
+        last_name__in={key[0] for key in keys},
+        first_name__in={key[1] for key in keys},
+    ).values_list(*PERSON_FIELDS)
+    return set(stored) & set(keys)
+
+
+def import_people(model, records, batch_size=1000, reject=None):
+    """Insert the Students or Instructors in ``records`` that are not stored yet.
+
+    ``records`` yields (line number, record, error) as read_records()
+    does. Each chunk of batch_size records is deduplicated (against
+    itself and the database) and inserted with one bulk_create in its
+    own transaction. reject(line number, reason) is called for every
+    record that cannot be imported. Returns the counts of created,
+    duplicate and rejected records.
+    """
+    totals = {'created': 0, 'duplicates': 0, 'rejected': 0}
+    for chunk in chunked(records, batch_size):
+        keys = {}
+        for number, record, error in chunk:
+            if error is None:
+                try:
+                    key = normalize_person(model, record)
+                except RowError as row_error:
+                    error = str(row_error)
+            if error is not None:
+                totals['rejected'] += 1
+                if reject is not None:
+                    reject(number, error)
+            elif key in keys:
+                totals['duplicates'] += 1
+            else:
+                keys[key] = number
+        if not keys:
+            continue
+        with transaction.atomic():
+            people = create_people(model, keys)
+            people_created(model, people)
+        totals['created'] += len(people)
+        totals['duplicates'] += len(keys) - len(people)
+    return totals
+
+
+def create_people(model, keys):
+    """bulk_create the people in ``keys`` that are not stored, returning the ones created.
+
+    The insert runs in a savepoint without ignore_conflicts, so every
+    row of a successful insert is known to be new and has its primary
+    key. Should another transaction store one of the people in between,
+    the insert fails, the stored keys are looked up again and the rest
+    are inserted.
+    """
+    while True:
+        stored = existing_people(model, keys)
+        people = [model(**dict(zip(PERSON_FIELDS, key))) for key in keys if key not in stored]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(people)
+            return people
+        except IntegrityError:
+            if existing_people(model, keys) == stored:
+                # not a duplicate person
+                raise
+
+
+def people_created(model, people):
+    """Do for bulk-created people what the post_save receivers would have done."""
+    if not people:
+        return
+    transaction.on_commit(partial(adjust_cached_count, model, len(people)))
+    bump_generation_on_commit(model)
+    if fts_available():
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # bulk_create could not set the primary keys; read them back
+            keys = {tuple(getattr(person, name) for name in PERSON_FIELDS) for person in people}
+            people = [
+                person for person in model.objects.filter(
+                    last_name__in={key[0] for key in keys}, first_name__in={key[1] for key in keys})
+                if tuple(getattr(person, name) for name in PERSON_FIELDS) in keys
+            ]
+        insert_fts_rows(model, people)
+
+
+def registration_lookups():
+    """Load the natural keys a registration record is resolved with, one query per model.
+
+    students maps (last_name, first_name, disambiguator) to the pk,
+    semesters maps (year, period_name) to the pk and sections maps
+    (semester pk, course_number, section_name) to (pk, sort_key).
+    """
+    return {
+        'students': {
+            tuple(row[1:]): row[0]
+            for row in Student.objects.order_by().values_list('pk', *PERSON_FIELDS).iterator(chunk_size=10000)
+        },
+        'semesters': {
+            (year, period): pk
+            for pk, year, period in Semester.objects.order_by().values_list('pk', 'year__year', 'period__period_name')
+        },
+        'sections': {
+            (semester_id, course_number, section_name): (pk, sort_key)
+            for pk, semester_id, course_number, section_name, sort_key in Section.objects.order_by().values_list(
+                'pk', 'semester_id', 'course__course_number', 'section_name', 'sort_key').iterator(chunk_size=10000)
+        },
+    }
+
+
+def line_chunks(file, size, first_line=1):
+    """Yield (number of the first line, lines) for every size lines of an open file."""
+    while lines := list(islice(file, size)):
+        yield first_line, lines
+        first_line += len(lines)
+
+
+def parsed_chunks(chunks, file_format, fieldnames, lookups, workers):
+    """parse_chunk() every chunk, in a pool of ``workers`` processes, yielding the results in order.
+
+    At most two chunks per worker are in flight, so a fast reader cannot
+    pile the whole file up in memory. With no workers the chunks are
+    parsed in this process.
+    """
+    if not workers:
+        for first_line, lines in chunks:
+            yield parse_chunk(file_format, fieldnames, first_line, lines, lookups)
+        return
+    with ProcessPoolExecutor(workers, initializer=start_worker, initargs=(lookups,)) as executor:
+        pending = deque()
+        for first_line, lines in chunks:
+            pending.append(executor.submit(parse_chunk, file_format, fieldnames, first_line, lines))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_registrations(rows):
+    """Insert the resolved (section_id, student_id, sort_key) rows that are not stored yet.
+
+    The writing half of the pipeline: one transaction, one lookup of the
+    pairs already registered and one create_registrations(). Section
+    capacity is not checked; the feed is the record of who is enrolled,
+    and enrollment_count is recounted to match. Returns (created,
+    duplicates).
+    """
+    sort_keys = {(section_id, student_id): sort_key for section_id, student_id, sort_key in rows}
+    with transaction.atomic():
+        stored = set(Registration.objects.filter(
+            section_id__in={section_id for section_id, _ in sort_keys},
+            student_id__in={student_id for _, student_id in sort_keys},
+        ).values_list('section_id', 'student_id')) & sort_keys.keys()
+        registrations = [
+            Registration(section_id=section_id, student_id=student_id, sort_key=sort_key)
+            for (section_id, student_id), sort_key in sort_keys.items() if (section_id, student_id) not in stored
+        ]
+        # one registered concurrently is skipped rather than failing the chunk
+        created = create_registrations(registrations)
+        registrations_created(created)
+    return len(created), len(sort_keys) - len(created)
+
+
+def registrations_created(registrations):
+    """Do for bulk-created registrations what enroll() and the receivers would have done."""
+    if not registrations:
+        return
+    recount_enrollments({registration.section_id for registration in registrations})
+    Student.objects.filter(pk__in={registration.student_id for registration in registrations}).touch()
+    transaction.on_commit(partial(adjust_cached_count, Registration, len(registrations)))
+    bump_generation_on_commit(Registration)
+
+
+def import_registrations(chunks, file_format, fieldnames=None, workers=0, reject=None):
+    """Run the registration import pipeline over chunks of raw lines.
+
+    The lookups are loaded once, the chunks are parsed and resolved by
+    the worker processes and the results are written, in file order, by
+    this process alone. reject(line number, reason, line) is called for
+    every record that could not be resolved. Returns the counts of
+    created, duplicate and rejected records.
+    """
+    totals = {'created': 0, 'duplicates': 0, 'rejected': 0}
+    lookups = registration_lookups()
+    for rows, rejects, duplicates in parsed_chunks(chunks, file_format, fieldnames, lookups, workers):
+        totals['rejected'] += len(rejects)
+        totals['duplicates'] += duplicates
+        if reject is not None:
+            for rejected in rejects:
+                reject(*rejected)
+        if rows:
+            created, stored = write_registrations(rows)
+            totals['created'] += created
+            totals['duplicates'] += stored
+    return totals
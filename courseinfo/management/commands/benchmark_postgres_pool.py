@@ -0,0 +1,117 @@
+import json
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from courseinfo.models import Course, Instructor, Registration, Section, Semester, Student
+from courseinfo.pool import pool_stats
+
+POOL_ENGINE = 'courseinfo.db_backends.postgresql_pool'
+PLAIN_ENGINE = 'django.db.backends.postgresql'
+
+# Keeps the benchmark's pages out of the shared cache; every request also
+# gets a query string of its own, so each one misses the page cache and
+# renders from the database.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'courseinfo-benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare courseinfo view latency on PostgreSQL with the pooled backend and '
+            'with a new connection per request. Run it with the production settings '
+            'pointed at a migrated, populated database (POSTGRES_DB and friends).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='An existing user allowed to view every page.')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per profile and thread (default 500).')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Number of concurrent client threads (default 8).')
+
+    def handle(self, *args, **options):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        if settings_dict['ENGINE'] != POOL_ENGINE:
+            raise CommandError('The default database must use %s.' % POOL_ENGINE)
+        try:
+            user = get_user_model().objects.get_by_natural_key(options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('No user named "%s".' % options['username'])
+        paths = self.get_paths()
+        connections[DEFAULT_DB_ALIAS].close()
+
+        plain_dict = dict(settings_dict, ENGINE=PLAIN_ENGINE, OPTIONS={
+            name: value for name, value in settings_dict['OPTIONS'].items() if name != 'pool'
+        })
+        plain_backend = load_backend(PLAIN_ENGINE)
+
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            for profile, make_connection in (
+                ('unpooled', lambda: plain_backend.DatabaseWrapper(plain_dict, DEFAULT_DB_ALIAS)),
+                ('pooled', None),
+            ):
+                latencies = self.run(user, paths, make_connection, options)
+                self.stdout.write(
+                    '%-8s requests %6d   mean %7.2f ms   p50 %7.2f ms   p95 %7.2f ms' % (
+                        profile,
+                        len(latencies),
+                        statistics.fmean(latencies),
+                        statistics.median(latencies),
+                        statistics.quantiles(latencies, n=20)[-1],
+                    )
+                )
+        self.stdout.write(json.dumps(pool_stats(), indent=2))
+
+    def get_paths(self):
+        paths = [
+            reverse('courseinfo_%s_list_urlpattern' % name)
+            for name in ('instructor', 'section', 'course', 'semester', 'student', 'registration')
+        ]
+        for model in (Instructor, Section, Course, Semester, Student, Registration):
+            obj = model.objects.order_by('pk').first()
+            if obj is None:
+                raise CommandError('The database has no %s rows.' % model._meta.verbose_name)
+            paths.append(obj.get_absolute_url())
+        return paths
+
+    def run(self, user, paths, make_connection, options):
+        latencies = []
+        lock = threading.Lock()
+
+        def client_thread():
+            if make_connection is not None:
+                # this thread's "default" connection, used by every query it makes
+                connections[DEFAULT_DB_ALIAS] = make_connection()
+            client = Client()
+            client.force_login(user)
+            connections.close_all()
+            times = []
+            for number in range(options['requests']):
+                path = paths[number % len(paths)]
+                started = time.perf_counter()
+                response = client.get(path, {'benchmark': number})
+                # what the request_finished handler does after a real request
+                # (the test client leaves it out)
+                connections.close_all()
+                times.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError('%s answered %s.' % (path, response.status_code))
+            with lock:
+                latencies.extend(times)
+
+        threads = [threading.Thread(target=client_thread) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies
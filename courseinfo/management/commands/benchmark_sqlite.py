@@ -0,0 +1,118 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from courseinfo.sqlite import PRAGMAS, apply_pragmas
+
+SCHEMA = '''
+CREATE TABLE section (id INTEGER PRIMARY KEY, enrollment_count INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE registration (
+    id INTEGER PRIMARY KEY,
+    section_id INTEGER NOT NULL REFERENCES section (id),
+    student_id INTEGER NOT NULL,
+    UNIQUE (section_id, student_id)
+);
+CREATE INDEX registration_section ON registration (section_id);
+'''
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent read/write throughput of a scratch SQLite database '
+            'with the default settings and with the courseinfo.sqlite pragmas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0,
+                            help='How long each profile runs (default 5).')
+        parser.add_argument('--readers', type=int, default=8,
+                            help='Number of reader threads (default 8).')
+        parser.add_argument('--writers', type=int, default=4,
+                            help='Number of writer threads (default 4).')
+        parser.add_argument('--sections', type=int, default=500,
+                            help='Number of sections in the scratch database (default 500).')
+
+    def handle(self, *args, **options):
+        for profile, pragmas in (('default', {}), ('tuned', PRAGMAS)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.create(path, options['sections'])
+                result = self.run(path, pragmas, options)
+            self.stdout.write(
+                '%-8s reads/s %9.1f   writes/s %8.1f   locked errors %6d' % (
+                    profile,
+                    result['reads'] / options['seconds'],
+                    result['writes'] / options['seconds'],
+                    result['locked'],
+                )
+            )
+
+    def create(self, path, sections):
+        db = sqlite3.connect(path, isolation_level=None)
+        db.executescript(SCHEMA)
+        db.executemany('INSERT INTO section (id) VALUES (?)', [(pk,) for pk in range(1, sections + 1)])
+        db.close()
+
+    def run(self, path, pragmas, options):
+        totals = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        student_ids = iter(range(1, 10 ** 9))
+
+        def connect():
+            # like Django: autocommit, explicit (deferred) BEGIN for atomic blocks
+            db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            apply_pragmas(db, pragmas)
+            return db
+
+        def record(reads=0, writes=0, locked=0):
+            with lock:
+                totals['reads'] += reads
+                totals['writes'] += writes
+                totals['locked'] += locked
+
+        def reader():
+            db = connect()
+            reads = 0
+            while not stop.is_set():
+                section_id = random.randint(1, options['sections'])
+                db.execute('SELECT enrollment_count FROM section WHERE id = ?', [section_id]).fetchone()
+                db.execute('SELECT student_id FROM registration WHERE section_id = ?', [section_id]).fetchall()
+                reads += 1
+            db.close()
+            record(reads=reads)
+
+        def writer():
+            db = connect()
+            writes = locked = 0
+            while not stop.is_set():
+                section_id = random.randint(1, options['sections'])
+                with lock:
+                    student_id = next(student_ids)
+                try:
+                    db.execute('BEGIN')
+                    db.execute('UPDATE section SET enrollment_count = enrollment_count + 1 WHERE id = ?',
+                               [section_id])
+                    db.execute('INSERT INTO registration (section_id, student_id) VALUES (?, ?)',
+                               [section_id, student_id])
+                    db.execute('COMMIT')
+                    writes += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+            db.close()
+            record(writes=writes, locked=locked)
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return totals
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseinfo.exports import FORMATS, REGISTRATION_COLUMNS, export_lines, registration_rows
+from courseinfo.imports import detect_format
+
+
+class Command(BaseCommand):
+    help = ('Write registrations, with the natural keys of their student, section, course, semester '
+            'and instructor, as CSV or JSON Lines. The output can be loaded with import_registrations.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='File to write (default: standard output).')
+        parser.add_argument('--format', choices=sorted(FORMATS),
+                            help='Output format (default: from the --output file name, else csv).')
+        parser.add_argument('--semester', type=int, help='Only this semester (primary key).')
+        parser.add_argument('--course', type=int, help='Only this course (primary key).')
+        parser.add_argument('--section', type=int, help='Only this section (primary key).')
+
+    def handle(self, *args, **options):
+        file_format = options['format']
+        if file_format is None:
+            try:
+                file_format = detect_format(options['output']) if options['output'] else 'csv'
+            except ValueError as error:
+                raise CommandError(error)
+        lines = export_lines(file_format, REGISTRATION_COLUMNS, registration_rows(
+            semester=options['semester'], course=options['course'], section=options['section'],
+        ))
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        started = time.monotonic()
+        rows = -1 if file_format == 'csv' else 0  # not counting the CSV header
+        try:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+                for line in lines:
+                    file.write(line)
+                    rows += 1
+        except OSError as error:
+            raise CommandError(error)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS('Wrote %s registrations to %s in %.1f s (%.0f rows/s).' % (
+            rows, options['output'], elapsed, rows / elapsed if elapsed else 0,
+        )))
@@ -0,0 +1,55 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseinfo.imports import detect_format, import_people, read_records
+from courseinfo.models import Instructor, Student
+
+MODELS = {'student': Student, 'instructor': Instructor}
+
+
+class Command(BaseCommand):
+    help = ('Load students or instructors from a CSV file (with a first_name, last_name, '
+            'disambiguator header) or a JSON Lines file of objects with those keys. '
+            'People already stored, or repeated in the file, are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(MODELS), help='What the file holds.')
+        parser.add_argument('path', help='The .csv or .jsonl file to load.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='File format (default: from the file name).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Records checked and inserted per transaction (default 1000).')
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        def reject(number, reason):
+            self.stderr.write('Line %s: %s' % (number, reason))
+
+        started = time.monotonic()
+        try:
+            totals = import_people(
+                model, read_records(options['path'], file_format), options['batch_size'], reject,
+            )
+        except OSError as error:
+            raise CommandError(error)
+        except (UnicodeDecodeError, csv.Error) as error:
+            # the chunks before this point are committed; a rerun skips them as duplicates
+            raise CommandError('Cannot read %s: %s' % (options['path'], error))
+        elapsed = time.monotonic() - started
+        records = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Created %s %s, skipped %s duplicates, rejected %s records '
+            '(%s records in %.1f s, %.0f records/s).' % (
+                totals['created'], model._meta.verbose_name_plural, totals['duplicates'], totals['rejected'],
+                records, elapsed, records / elapsed if elapsed else 0,
+            )
+        ))
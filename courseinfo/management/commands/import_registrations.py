@@ -0,0 +1,69 @@
+import csv
+import os
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseinfo.imports import detect_format, import_registrations, line_chunks
+
+
+class Command(BaseCommand):
+    help = ('Load registrations from a CSV file (with a last_name, first_name, disambiguator, '
+            'course_number, section_name, year, period header) or a JSON Lines file of objects '
+            'with those keys. period is the period name, e.g. "Spring". Registrations already '
+            'stored, or repeated in the file, are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The .csv or .jsonl file to load.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='File format (default: from the file name).')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Lines parsed, and registrations inserted, per chunk (default 5000).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Parsing processes; 0 parses in this process (default: one per CPU).')
+        parser.add_argument('--rejects',
+                            help='Write the rejected records to this CSV file instead of stderr.')
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        started = time.monotonic()
+        try:
+            with ExitStack() as stack:
+                file = stack.enter_context(open(options['path'], newline='', encoding='utf-8-sig'))
+                reject = self.get_reject(stack, options['rejects'])
+                fieldnames, first_line = None, 1
+                if file_format == 'csv':
+                    fieldnames = next(csv.reader([file.readline()]), [])
+                    first_line = 2
+                totals = import_registrations(
+                    line_chunks(file, options['batch_size'], first_line), file_format, fieldnames,
+                    options['workers'], reject,
+                )
+        except OSError as error:
+            raise CommandError(error)
+        except UnicodeDecodeError as error:
+            # the chunks before this point are committed; a rerun skips them as duplicates
+            raise CommandError('Cannot read %s: %s' % (options['path'], error))
+        elapsed = time.monotonic() - started
+        records = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Created %s registrations, skipped %s duplicates, rejected %s records '
+            '(%s records in %.1f s, %.0f records/s).' % (
+                totals['created'], totals['duplicates'], totals['rejected'],
+                records, elapsed, records / elapsed if elapsed else 0,
+            )
+        ))
+
+    def get_reject(self, stack, path):
+        """Return the reject(line number, reason, line) callback, writing to path or stderr."""
+        if not path:
+            return lambda number, reason, line: self.stderr.write('Line %s: %s' % (number, reason))
+        writer = csv.writer(stack.enter_context(open(path, 'w', newline='', encoding='utf-8')))
+        writer.writerow(['line', 'reason', 'record'])
+        return lambda number, reason, line: writer.writerow([number, reason, line])
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from courseinfo.replicas import refresh_sqlite_replica, replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copy the default SQLite database over its read replicas with the online backup API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases',
+                            help='Replica alias to refresh (default: every COURSEINFO_READ_REPLICAS alias).')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep refreshing every this many seconds (default: refresh once).')
+
+    def handle(self, *args, **options):
+        aliases = options['databases'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No replicas configured; set COURSEINFO_READ_REPLICAS.')
+        for alias in aliases + [DEFAULT_DB_ALIAS]:
+            if alias not in connections:
+                raise CommandError('%s is not in DATABASES.' % alias)
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('%s is not an SQLite database.' % alias)
+        while True:
+            for alias in aliases:
+                started = time.monotonic()
+                refresh_sqlite_replica(alias)
+                self.stdout.write('Refreshed %s from %s in %.1f ms.' % (
+                    alias, DEFAULT_DB_ALIAS, (time.monotonic() - started) * 1000))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from courseinfo.models import Registration, Section
+from courseinfo.services import recount_enrollments
+
+
+class Command(BaseCommand):
+    help = 'Compare Section.enrollment_count with the Registration rows and repair any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of sections checked per query (default 1000).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted sections without changing them.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Section.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'enrollment_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            section_ids = [pk for pk, _ in batch]
+            actual = dict(
+                Registration.objects.filter(section_id__in=section_ids).order_by()
+                .values('section_id').annotate(total=Count('pk')).values_list('section_id', 'total')
+            )
+            wrong = [pk for pk, stored in batch if stored != actual.get(pk, 0)]
+            for pk, stored in batch:
+                if pk in wrong:
+                    self.stdout.write('Section %s: stored %s, actual %s' % (pk, stored, actual.get(pk, 0)))
+            if wrong and not options['dry_run']:
+                with transaction.atomic():
+                    recount_enrollments(wrong)
+            checked += len(batch)
+            drifted += len(wrong)
+        verb = 'found' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(
+            'Checked %s sections, %s %s with drifted enrollment counts.' % (checked, verb, drifted)
+        ))
@@ -0,0 +1,37 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from courseinfo.snapshot import InconsistentSnapshot, write_snapshot
+
+
+class Command(BaseCommand):
+    help = ('Write the registrations, with their sections, courses, semesters and instructors, '
+            'to a directory of NumPy arrays that courseinfo.analytics reads (see courseinfo.snapshot). '
+            'An existing snapshot in the directory is replaced.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory to write the snapshot to.')
+        parser.add_argument('--database', choices=list(connections),
+                            help='Database to read (default: a read replica if courseinfo reads '
+                                 'are routed to one, else %s).' % DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            manifest = write_snapshot(options['path'], using=options['database'])
+        except (InconsistentSnapshot, OSError) as error:
+            raise CommandError(error)
+        elapsed = time.monotonic() - started
+        size = sum(entry.stat().st_size for entry in os.scandir(options['path']))
+        tables = manifest['tables']
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %s registrations, %s sections, %s courses, %s semesters and %s instructors '
+            'from %s to %s (%.1f MB in %.1f s).' % (
+                tables['registrations']['rows'], tables['sections']['rows'], tables['courses']['rows'],
+                tables['semesters']['rows'], tables['instructors']['rows'], manifest['database'],
+                options['path'], size / 2 ** 20, elapsed,
+            )
+        ))
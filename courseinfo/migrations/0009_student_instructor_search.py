@@ -0,0 +1,73 @@
+# Generated by Django 4.1.7 on 2026-10-18 14:57
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+FTS_TABLES = [('courseinfo_student', 'student_id'), ('courseinfo_instructor', 'instructor_id')]
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def create_fts_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if not has_fts5(connection):
+        return
+    for table, pk in FTS_TABLES:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE %s_fts USING fts5(last_name, first_name, disambiguator)' % table
+        )
+        schema_editor.execute(
+            'INSERT INTO %s_fts (rowid, last_name, first_name, disambiguator) '
+            'SELECT %s, last_name, first_name, disambiguator FROM %s'
+            % (table, pk, table)
+        )
+
+
+def drop_fts_tables(apps, schema_editor):
+    for table, pk in FTS_TABLES:
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute('DROP TABLE IF EXISTS %s_fts' % table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseinfo', '0008create_group_permissions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instructor',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='instructor_last_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instructor',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='instructor_first_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instructor',
+            index=models.Index(django.db.models.functions.text.Lower('disambiguator'), name='instructor_disamb_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='student_last_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='student_first_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Lower('disambiguator'), name='student_disamb_lower_idx'),
+        ),
+        migrations.RunPython(
+            create_fts_tables,
+            drop_fts_tables
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_enrollments(apps, schema_editor):
+    section_model_class = apps.get_model('courseinfo', 'Section')
+    registration_model_class = apps.get_model('courseinfo', 'Registration')
+    registrations = registration_model_class.objects.filter(
+        section=OuterRef('pk')
+    ).order_by().values('section').annotate(total=Count('pk')).values('total')
+    section_model_class.objects.update(enrollment_count=Coalesce(Subquery(registrations), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseinfo', '0009_student_instructor_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Leave blank for no seat limit.', null=True),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            count_enrollments,
+            migrations.RunPython.noop
+        ),
+    ]
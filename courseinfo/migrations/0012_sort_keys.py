@@ -0,0 +1,77 @@
+# Generated by Django 4.1.7
+
+from django.db import migrations
+
+import courseinfo.models
+
+# courseinfo.models.make_sort_key, frozen here
+SORT_KEY_SEPARATOR = '\x1f'
+
+
+def fill(queryset, build_sort_key, chunk_size=2000):
+    # one chunk of rows in memory at a time, however large the table
+    changed = []
+    for obj in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+        obj.sort_key = build_sort_key(obj)
+        changed.append(obj)
+        if len(changed) == chunk_size:
+            queryset.model.objects.bulk_update(changed, ['sort_key'], batch_size=500)
+            changed = []
+    queryset.model.objects.bulk_update(changed, ['sort_key'], batch_size=500)
+
+
+def fill_sort_keys(apps, schema_editor):
+    Semester = apps.get_model('courseinfo', 'Semester')
+    Section = apps.get_model('courseinfo', 'Section')
+    Registration = apps.get_model('courseinfo', 'Registration')
+    # in this order: a section's key includes its semester's, and a
+    # registration's its section's
+    fill(Semester.objects.select_related('year', 'period'), lambda semester: SORT_KEY_SEPARATOR.join(
+        ['%06d' % semester.year.year, '%06d' % semester.period.period_sequence]
+    ))
+    fill(Section.objects.select_related('course', 'semester'), lambda section: SORT_KEY_SEPARATOR.join([
+        section.course.course_number, section.course.course_name,
+        section.section_name, section.semester.sort_key,
+    ]))
+    fill(Registration.objects.select_related('section', 'student'), lambda registration: SORT_KEY_SEPARATOR.join([
+        registration.section.sort_key, registration.student.last_name,
+        registration.student.first_name, registration.student.disambiguator,
+    ]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseinfo', '0011_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='semester',
+            name='sort_key',
+            field=courseinfo.models.SortKeyField(db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='sort_key',
+            field=courseinfo.models.SortKeyField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='sort_key',
+            field=courseinfo.models.SortKeyField(db_index=True, default='', editable=False, max_length=480),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='semester',
+            options={'ordering': ['sort_key']},
+        ),
+        migrations.AlterModelOptions(
+            name='section',
+            options={'ordering': ['sort_key']},
+        ),
+        migrations.AlterModelOptions(
+            name='registration',
+            options={'ordering': ['sort_key']},
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseinfo', '0012_sort_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registration',
+            name='section',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='registrations', to='courseinfo.section'),
+        ),
+        migrations.AlterField(
+            model_name='registration',
+            name='student',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='registrations', to='courseinfo.student'),
+        ),
+        migrations.AlterField(
+            model_name='section',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='sections', to='courseinfo.course'),
+        ),
+        migrations.AlterField(
+            model_name='section',
+            name='instructor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='sections', to='courseinfo.instructor'),
+        ),
+        migrations.AlterField(
+            model_name='section',
+            name='semester',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='sections', to='courseinfo.semester'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['student', 'sort_key'], name='registration_student_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['section', 'sort_key'], name='registration_section_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['instructor', 'sort_key'], name='section_instructor_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['course', 'sort_key'], name='section_course_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['semester', 'sort_key'], name='section_semester_sort_idx'),
+        ),
+    ]
@@ -1,6 +1,63 @@
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, router, transaction
+from django.db.models import Index, UniqueConstraint
+from django.db.models.functions import Lower
 from django.urls import reverse
+from django.utils import timezone
+
+# Joins the parts of a sort_key. Under the binary collation SortKeyField
+# asks for it sorts below every printable character, so comparing two
+# keys compares their parts in order, as the chained Meta.ordering they
+# replace did.
+SORT_KEY_SEPARATOR = '\x1f'
+
+
+def make_sort_key(*parts):
+    return SORT_KEY_SEPARATOR.join(parts)
+
+
+class SortKeyField(models.CharField):
+    """A CharField compared code point by code point on every backend.
+
+    The separator only sorts first under a binary collation. SQLite's
+    default BINARY is one; PostgreSQL's usual glibc and ICU collations
+    skip control characters, so the column is declared COLLATE "C"
+    there. SQLite has no collation by that name.
+    """
+
+    def db_parameters(self, connection):
+        parameters = super().db_parameters(connection)
+        if connection.vendor == 'postgresql':
+            parameters['collation'] = 'C'
+        return parameters
+
+
+class TouchQuerySet(models.QuerySet):
+    # updated_at is bumped by auto_now on save and, through touch(), by
+    # courseinfo.signals whenever rows shown on the object's detail page change
+    def touch(self):
+        """Set updated_at on every row, without sending any signals."""
+        return self.update(updated_at=timezone.now())
+
+
+class SortKeyQuerySet(TouchQuerySet):
+    # for models with a denormalized sort_key, kept current by
+    # courseinfo.signals when the rows it is built from change
+    sort_key_related = ()
+
+    def refresh_sort_keys(self, batch_size=500):
+        """Rebuild sort_key on every row, writing only the ones that changed."""
+        changed = []
+        for obj in self.select_related(*self.sort_key_related).order_by():
+            sort_key = obj.build_sort_key()
+            if obj.sort_key != sort_key:
+                obj.sort_key = sort_key
+                changed.append(obj)
+        self.model.objects.bulk_update(changed, ['sort_key'], batch_size=batch_size)
+        return len(changed)
+
+
+class SemesterQuerySet(SortKeyQuerySet):
+    sort_key_related = ('year', 'period')
 
 
 # Create your models here.
@@ -31,10 +88,19 @@ class Semester(models.Model):
     semester_id = models.AutoField(primary_key=True)
     year = models.ForeignKey(Year, related_name='semesters', on_delete=models.PROTECT)
     period = models.ForeignKey(Period, related_name='semesters', on_delete=models.PROTECT)
+    updated_at = models.DateTimeField(auto_now=True)
+    # year, then period_sequence; see build_sort_key()
+    sort_key = SortKeyField(max_length=20, db_index=True, editable=False, default='')
+
+    objects = SemesterQuerySet.as_manager()
 
     def __str__(self):
         return '%s - %s' % (self.year.year, self.period.period_name)
 
+    def build_sort_key(self):
+        # zero-padded so that the numbers compare as strings
+        return make_sort_key('%06d' % self.year.year, '%06d' % self.period.period_sequence)
+
     def get_absolute_url(self):
         return reverse('courseinfo_semester_detail_urlpattern', kwargs={'pk': self.pk})
 
@@ -45,7 +111,7 @@ class Semester(models.Model):
         return reverse('courseinfo_semester_delete_urlpattern', kwargs={'pk': self.pk})
 
     class Meta:
-        ordering = ['year__year', 'period__period_sequence']
+        ordering = ['sort_key']
         constraints = [
             UniqueConstraint(fields=['year', 'period'], name='unique_semester')
         ]
@@ -55,6 +121,9 @@ class Course(models.Model):
     course_id = models.AutoField(primary_key=True)
     course_number = models.CharField(max_length=20)
     course_name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TouchQuerySet.as_manager()
 
     def __str__(self):
         return '%s - %s' % (self.course_number, self.course_name)
@@ -80,6 +149,9 @@ class Instructor(models.Model):
     first_name = models.CharField(max_length=45)
     last_name = models.CharField(max_length=45)
     disambiguator = models.CharField(max_length=45, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TouchQuerySet.as_manager()
 
     def __str__(self):
         result = ''
@@ -103,6 +175,11 @@ class Instructor(models.Model):
         constraints = [
             UniqueConstraint(fields=['last_name', 'first_name', 'disambiguator'], name='unique_instructor')
         ]
+        indexes = [
+            Index(Lower('last_name'), name='instructor_last_lower_idx'),
+            Index(Lower('first_name'), name='instructor_first_lower_idx'),
+            Index(Lower('disambiguator'), name='instructor_disamb_lower_idx'),
+        ]
 
 
 class Student(models.Model):
@@ -110,6 +187,9 @@ class Student(models.Model):
     first_name = models.CharField(max_length=45)
     last_name = models.CharField(max_length=45)
     disambiguator = models.CharField(max_length=45, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TouchQuerySet.as_manager()
 
     def __str__(self):
         result = ''
@@ -133,18 +213,46 @@ class Student(models.Model):
         constraints = [
             UniqueConstraint(fields=['last_name', 'first_name', 'disambiguator'], name='unique_student')
         ]
+        indexes = [
+            Index(Lower('last_name'), name='student_last_lower_idx'),
+            Index(Lower('first_name'), name='student_first_lower_idx'),
+            Index(Lower('disambiguator'), name='student_disamb_lower_idx'),
+        ]
+
+
+class SectionQuerySet(SortKeyQuerySet):
+    sort_key_related = ('course', 'semester')
+
+    def with_related(self):
+        # Section.__str__ reads course, semester, year and period
+        return self.select_related('course', 'semester__year', 'semester__period', 'instructor')
 
 
 class Section(models.Model):
     section_id = models.AutoField(primary_key=True)
     section_name = models.CharField(max_length=20)
-    semester = models.ForeignKey(Semester, related_name='sections', on_delete=models.PROTECT)
-    course = models.ForeignKey(Course, related_name='sections', on_delete=models.PROTECT)
-    instructor = models.ForeignKey(Instructor, related_name='sections', on_delete=models.PROTECT)
+    # indexed together with sort_key in Meta.indexes
+    semester = models.ForeignKey(Semester, related_name='sections', on_delete=models.PROTECT, db_index=False)
+    course = models.ForeignKey(Course, related_name='sections', on_delete=models.PROTECT, db_index=False)
+    instructor = models.ForeignKey(Instructor, related_name='sections', on_delete=models.PROTECT, db_index=False)
+    capacity = models.PositiveIntegerField(null=True, blank=True, help_text='Leave blank for no seat limit.')
+    # maintained by the Registration receivers in courseinfo.signals and by
+    # courseinfo.services; never COUNT(*) registrations to check for seats
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # course, section_name, then semester; see build_sort_key()
+    sort_key = SortKeyField(max_length=320, db_index=True, editable=False, default='')
+
+    objects = SectionQuerySet.as_manager()
 
     def __str__(self):
         return '%s - %s %s' % (self.course.course_number, self.section_name, self.semester.__str__())
 
+    def build_sort_key(self):
+        return make_sort_key(
+            self.course.course_number, self.course.course_name, self.section_name, self.semester.sort_key
+        )
+
     def get_absolute_url(self):
         return reverse('courseinfo_section_detail_urlpattern', kwargs={'pk': self.pk})
 
@@ -155,20 +263,54 @@ class Section(models.Model):
         return reverse('courseinfo_section_delete_urlpattern', kwargs={'pk': self.pk})
 
     class Meta:
-        ordering = ['course', 'section_name', 'semester']
+        ordering = ['sort_key']
         constraints = [
             UniqueConstraint(fields=['semester', 'course', 'section_name'], name='unique_section')
         ]
+        # the section lists of the instructor, course and semester pages,
+        # filtered on the foreign key and read in sort_key order
+        indexes = [
+            Index(fields=['instructor', 'sort_key'], name='section_instructor_sort_idx'),
+            Index(fields=['course', 'sort_key'], name='section_course_sort_idx'),
+            Index(fields=['semester', 'sort_key'], name='section_semester_sort_idx'),
+        ]
+
+
+class RegistrationQuerySet(SortKeyQuerySet):
+    sort_key_related = ('section', 'student')
+
+    def with_related(self):
+        # Registration.__str__ reads the section (and its whole graph) and the student
+        return self.select_related(
+            'section__course', 'section__semester__year', 'section__semester__period', 'student'
+        )
 
 
 class Registration(models.Model):
     registration_id = models.AutoField(primary_key=True)
-    student = models.ForeignKey(Student, related_name='registrations', on_delete=models.PROTECT)
-    section = models.ForeignKey(Section, related_name='registrations', on_delete=models.PROTECT)
+    # indexed together with sort_key in Meta.indexes
+    student = models.ForeignKey(Student, related_name='registrations', on_delete=models.PROTECT, db_index=False)
+    section = models.ForeignKey(Section, related_name='registrations', on_delete=models.PROTECT, db_index=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # section, then student; see build_sort_key()
+    sort_key = SortKeyField(max_length=480, db_index=True, editable=False, default='')
+
+    objects = RegistrationQuerySet.as_manager()
 
     def __str__(self):
         return '%s / %s' % (self.section, self.student)
 
+    def save(self, *args, **kwargs):
+        # the seat the pre_save receiver takes goes back if the write fails
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    def build_sort_key(self):
+        return make_sort_key(
+            self.section.sort_key, self.student.last_name, self.student.first_name, self.student.disambiguator
+        )
+
     def get_absolute_url(self):
         return reverse('courseinfo_registration_detail_urlpattern', kwargs={'pk': self.pk})
 
@@ -179,7 +321,12 @@ class Registration(models.Model):
         return reverse('courseinfo_registration_delete_urlpattern', kwargs={'pk': self.pk})
 
     class Meta:
-        ordering = ['section', 'student']
+        ordering = ['sort_key']
         constraints = [
             UniqueConstraint(fields=['section', 'student'], name='unique_registration')
         ]
+        # the registration lists of the student and section pages
+        indexes = [
+            Index(fields=['student', 'sort_key'], name='registration_student_sort_idx'),
+            Index(fields=['section', 'sort_key'], name='registration_section_sort_idx'),
+        ]
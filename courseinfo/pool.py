@@ -0,0 +1,185 @@
+"""A bounded, thread-safe pool of DB-API connections.
+
+Used by the courseinfo.db_backends.postgresql_pool database backend,
+but knows nothing about PostgreSQL: it is given a ``connect`` callable
+that opens a connection, a ``check`` callable that raises if one is no
+longer usable and a ``reset`` callable that makes a returned one clean.
+Pools live for the whole process, one per set of connection parameters;
+pool_stats() reports on all of them.
+"""
+import threading
+import time
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, check, reset, max_size=10, max_lifetime=3600.0,
+                 max_idle=600.0, timeout=30.0, name=''):
+        self.name = name
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        # (connection, returned at), most recently returned last
+        self._idle = []
+        # id(connection) -> opened at, for every open connection
+        self._opened_at = {}
+        # open connections plus those being opened
+        self._size = 0
+        self.metrics = {
+            'checkouts': 0,
+            'connections_opened': 0,
+            'connect_errors': 0,
+            'closed_expired': 0,
+            'closed_unhealthy': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+        }
+
+    def stats(self):
+        with self._condition:
+            return dict(
+                self.metrics,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.max_size,
+            )
+
+    def getconn(self):
+        """Check a connection out, opening one if the pool has room.
+
+        Idle connections past max_lifetime or max_idle are closed and the
+        rest are health-checked before one is handed out. When all
+        max_size connections are in use this waits up to ``timeout``
+        seconds for one to come back, then raises PoolTimeout.
+        """
+        while True:
+            connection = self._reserve()
+            if connection is None:
+                return self._open()
+            try:
+                self.check(connection)
+            except Exception:
+                with self._condition:
+                    self._close(connection, 'closed_unhealthy')
+                continue
+            return connection
+
+    def _reserve(self):
+        """Take an idle connection, or None after reserving room for a new one."""
+        deadline = time.monotonic() + self.timeout
+        waited_since = None
+        with self._condition:
+            try:
+                while True:
+                    now = time.monotonic()
+                    while self._idle:
+                        connection, returned_at = self._idle.pop()
+                        if self._expired(connection, now) or now - returned_at > self.max_idle:
+                            self._close(connection, 'closed_expired')
+                            continue
+                        self.metrics['checkouts'] += 1
+                        return connection
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self.metrics['checkouts'] += 1
+                        return None
+                    if now >= deadline:
+                        self.metrics['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No connection came free within %s seconds.' % self.timeout
+                        )
+                    if waited_since is None:
+                        waited_since = now
+                        self.metrics['waits'] += 1
+                    self._condition.wait(deadline - now)
+            finally:
+                if waited_since is not None:
+                    self.metrics['wait_seconds'] += time.monotonic() - waited_since
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self.metrics['connect_errors'] += 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[id(connection)] = time.monotonic()
+            self.metrics['connections_opened'] += 1
+        return connection
+
+    def _expired(self, connection, now):
+        return now - self._opened_at[id(connection)] > self.max_lifetime
+
+    def putconn(self, connection, discard=False):
+        """Return a checked-out connection; ``discard`` closes it instead."""
+        if not discard:
+            try:
+                self.reset(connection)
+            except Exception:
+                discard = True
+        with self._condition:
+            now = time.monotonic()
+            if discard:
+                self._close(connection, 'closed_unhealthy')
+            elif self._expired(connection, now):
+                self._close(connection, 'closed_expired')
+            else:
+                self._idle.append((connection, now))
+                self._condition.notify()
+
+    def _close(self, connection, reason):
+        # called with the lock held
+        del self._opened_at[id(connection)]
+        self._size -= 1
+        self.metrics[reason] += 1
+        self._condition.notify()
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close the idle connections; those checked out close when returned."""
+        with self._condition:
+            self.max_lifetime = -1
+            while self._idle:
+                self._close(self._idle.pop()[0], 'closed_expired')
+
+
+def get_pool(key, create):
+    """Return the process's pool for ``key``, calling create() to make it on first use."""
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = create()
+        return _pools[key]
+
+
+def pool_stats():
+    """ConnectionPool.stats() for every pool in this process, by name."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
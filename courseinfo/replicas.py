@@ -0,0 +1,98 @@
+"""Read replicas for courseinfo.
+
+List the replica aliases of DATABASES in COURSEINFO_READ_REPLICAS and
+add ReplicaRouter to DATABASE_ROUTERS and ReplicaPinningMiddleware to
+MIDDLEWARE (after SessionMiddleware). courseinfo reads then go to a
+random replica and writes to ``default``. Reads stay on ``default``:
+
+* inside a transaction on ``default``,
+* for the rest of a request once it has written anything, and
+* for COURSEINFO_REPLICA_PIN_SECONDS after that in the same session,
+  so users see their own changes before the replicas catch up.
+
+Other apps (auth, sessions) always use ``default``.
+"""
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_SESSION_KEY = 'courseinfo_primary_until'
+DEFAULT_PIN_SECONDS = 15
+
+_pinned = contextvars.ContextVar('courseinfo_pinned_to_primary', default=False)
+_wrote = contextvars.ContextVar('courseinfo_wrote', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'COURSEINFO_READ_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'COURSEINFO_REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS)
+
+
+def mark_written():
+    """Send this request's reads, and the session's for a while, to default."""
+    _pinned.set(True)
+    _wrote.set(True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if (not replicas or model._meta.app_label != 'courseinfo'
+                or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'courseinfo':
+            mark_written()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replicas are copies of default, schema included
+        return db not in replica_aliases()
+
+
+class ReplicaPinningMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+        pinned = _pinned.set(request.session.get(PIN_SESSION_KEY, 0) > time.time())
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                request.session[PIN_SESSION_KEY] = time.time() + pin_seconds()
+        finally:
+            _pinned.reset(pinned)
+            _wrote.reset(wrote)
+        return response
+
+
+def copy_sqlite_database(source, target):
+    """Copy one sqlite3 connection's database over another's with the online backup API.
+
+    The copy is a consistent snapshot of the source, taken in one step,
+    so readers of the target never see a half-copied database.
+    """
+    source.backup(target)
+
+
+def refresh_sqlite_replica(alias, source_alias=DEFAULT_DB_ALIAS):
+    """Refresh an SQLite replica alias with a copy of ``source_alias``."""
+    source, target = connections[source_alias], connections[alias]
+    source.ensure_connection()
+    target.ensure_connection()
+    copy_sqlite_database(source.connection, target.connection)
@@ -0,0 +1,120 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+SEARCH_FIELDS = ('last_name', 'first_name', 'disambiguator')
+
+# Sorts after any character that can follow a prefix, so that
+# "prefix <= value < prefix + PREFIX_END" is an index range scan.
+PREFIX_END = '\U0010ffff'
+
+
+def fts_table(model):
+    return '%s_fts' % model._meta.db_table
+
+
+@lru_cache(maxsize=None)
+def _sqlite_has_fts5(vendor):
+    if vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def fts_available():
+    return _sqlite_has_fts5(connection.vendor)
+
+
+def fts_enabled():
+    return getattr(settings, 'COURSEINFO_SEARCH_FTS', False) and fts_available()
+
+
+def search_terms(q):
+    return q.replace(',', ' ').lower().split()
+
+
+def _prefix_condition(term):
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{
+            '%s_lower__gte' % field: term,
+            '%s_lower__lt' % field: term + PREFIX_END,
+        })
+    return condition
+
+
+def _fts_query(terms):
+    # every term is a quoted prefix query: "saoj"* AND "sau"*
+    return ' AND '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+
+def search_people(queryset, q):
+    """Filter students or instructors whose names start with every term of q.
+
+    Each term may match the start of the last name, first name or
+    disambiguator. The default lookup compares against the lower()-ed
+    columns, which the search indexes on Student and Instructor cover.
+    With COURSEINFO_SEARCH_FTS on SQLite the FTS5 table is used instead.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return queryset
+    if fts_enabled():
+        rowids = RawSQL(
+            'SELECT rowid FROM %s WHERE %s MATCH %%s' % ((fts_table(queryset.model),) * 2),
+            [_fts_query(terms)],
+        )
+        return queryset.filter(pk__in=rowids)
+    queryset = queryset.alias(**{'%s_lower' % field: Lower(field) for field in SEARCH_FIELDS})
+    for term in terms:
+        queryset = queryset.filter(_prefix_condition(term))
+    return queryset
+
+
+def search_sections(queryset, q):
+    """Filter sections by a course number prefix, then a section name prefix.
+
+    "is4 a" matches course IS439, section AL1. The course number range
+    is served by the unique_course index.
+    """
+    terms = q.split()
+    if not terms:
+        return queryset
+    course_number = terms[0].upper()
+    queryset = queryset.filter(
+        course__course_number__gte=course_number,
+        course__course_number__lt=course_number + PREFIX_END,
+    )
+    if len(terms) > 1:
+        section_name = terms[1].upper()
+        queryset = queryset.filter(section_name__gte=section_name, section_name__lt=section_name + PREFIX_END)
+    return queryset
+
+
+def sync_fts_row(instance):
+    table = fts_table(type(instance))
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % table, [instance.pk])
+        cursor.execute(
+            'INSERT INTO %s (rowid, %s) VALUES (%%s, %%s, %%s, %%s)' % (table, ', '.join(SEARCH_FIELDS)),
+            [instance.pk] + [getattr(instance, field) for field in SEARCH_FIELDS],
+        )
+
+
+def delete_fts_row(instance):
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % fts_table(type(instance)), [instance.pk])
+
+
+def insert_fts_rows(model, instances):
+    """sync_fts_row() for many new rows at once."""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO %s (rowid, %s) VALUES (%%s, %%s, %%s, %%s)' % (fts_table(model), ', '.join(SEARCH_FIELDS)),
+            [[instance.pk] + [getattr(instance, field) for field in SEARCH_FIELDS] for instance in instances],
+        )
@@ -0,0 +1,191 @@
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courseinfo.generations import bump_generation_on_commit
+from courseinfo.models import Registration, Section, Student
+from courseinfo.utils import adjust_cached_count
+
+ENROLLED = 'enrolled'
+ALREADY_REGISTERED = 'already registered'
+NO_SUCH_STUDENT = 'no such student'
+SECTION_FULL = 'section full'
+
+
+class SectionFull(Exception):
+    pass
+
+
+def reserve_seats(section_id, seats):
+    """Take seats in a section with one conditional UPDATE.
+
+    The UPDATE both checks and bumps enrollment_count, so concurrent
+    callers are serialized by the database row (or, on SQLite, write)
+    lock and can never take more seats than the section has.
+    """
+    has_room = Q(capacity__isnull=True) | Q(enrollment_count__lte=F('capacity') - seats)
+    reserved = Section.objects.filter(has_room, pk=section_id).update(
+        enrollment_count=F('enrollment_count') + seats
+    ) == 1
+    if reserved:
+        # update() sends no post_save signal
+        bump_generation_on_commit(Section)
+    return reserved
+
+
+def release_seats(section_id, seats=1):
+    # a drifted counter stays at zero rather than violating its CHECK constraint
+    Section.objects.filter(pk=section_id, enrollment_count__gte=seats).update(
+        enrollment_count=F('enrollment_count') - seats
+    )
+    bump_generation_on_commit(Section)
+
+
+def _seats_left(section_id):
+    capacity, enrollment_count = Section.objects.values_list(
+        'capacity', 'enrollment_count').get(pk=section_id)
+    if capacity is None:
+        return None
+    return max(capacity - enrollment_count, 0)
+
+
+def enroll(section, student):
+    """Register a student in a section, raising SectionFull when it has no seat left.
+
+    The seat is taken by the Registration pre_save receiver (see
+    courseinfo.signals); an IntegrityError from a duplicate registration
+    rolls it back too.
+    """
+    with transaction.atomic():
+        return Registration.objects.create(section=section, student=student)
+
+
+def drop(registration):
+    """Delete a registration; the post_delete receiver gives its seat back.
+
+    A registration that is already gone (say, from a second submit of
+    the same delete form) is left alone and False is returned, so its
+    seat is not given back twice.
+    """
+    with transaction.atomic():
+        # the row lock makes a concurrent drop wait, then find no row;
+        # a stale instance whose row is gone is never deleted, so no
+        # post_delete receiver gives its seat back or lowers the cached
+        # count a second time
+        current = Registration.objects.select_for_update().filter(pk=registration.pk).order_by().first()
+        if current is None:
+            return False
+        deleted, _ = current.delete()
+        return bool(deleted)
+
+
+def move(registration):
+    """Save a registration whose section may have changed.
+
+    A move takes a seat in the new section (raising SectionFull if there
+    is none) and gives one back to the old section in the same transaction.
+    """
+    with transaction.atomic():
+        registration.save()
+        return registration
+
+
+def recount_enrollments(section_ids):
+    """Reset enrollment_count from the Registration rows of the given sections.
+
+    The count is taken inside the UPDATE itself, so registrations created
+    concurrently cannot slip in between counting and writing.
+    """
+    registrations = Registration.objects.filter(
+        section=OuterRef('pk')
+    ).order_by().values('section').annotate(total=Count('pk')).values('total')
+    updated = Section.objects.filter(pk__in=section_ids).update(
+        enrollment_count=Coalesce(Subquery(registrations), 0),
+        updated_at=timezone.now(),
+    )
+    bump_generation_on_commit(Section)
+    return updated
+
+
+def create_registrations(registrations, batch_size=500):
+    """bulk_create registrations, leaving out any another transaction registered first.
+
+    The insert runs in a savepoint without ignore_conflicts, so when it
+    succeeds every row in it is known to be new. When a concurrent
+    registration of the same (section, student) pair makes it fail, the
+    pairs now stored are dropped and the rest are inserted again.
+    Returns the registrations that were created.
+    """
+    while registrations:
+        try:
+            with transaction.atomic():
+                Registration.objects.bulk_create(registrations, batch_size=batch_size)
+            return registrations
+        except IntegrityError:
+            taken = set(Registration.objects.filter(
+                section_id__in={registration.section_id for registration in registrations},
+                student_id__in={registration.student_id for registration in registrations},
+            ).values_list('section_id', 'student_id'))
+            remaining = [
+                registration for registration in registrations
+                if (registration.section_id, registration.student_id) not in taken
+            ]
+            if len(remaining) == len(registrations):
+                # not a duplicate registration
+                raise
+            registrations = remaining
+    return []
+
+
+def bulk_enroll(section, student_ids, batch_size=500):
+    """Register many students in one section.
+
+    Uniqueness is checked with a single IN query against the section's
+    registrations and the new rows go in with bulk_create, all in one
+    transaction. Returns a dict mapping each distinct student ID, in the
+    order given, to ENROLLED, ALREADY_REGISTERED, NO_SUCH_STUDENT or,
+    once the section's seats run out, SECTION_FULL.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    with transaction.atomic():
+        # the names go into each registration's sort_key
+        known = Student.objects.only('last_name', 'first_name', 'disambiguator').in_bulk(student_ids)
+        registered = set(
+            section.registrations.filter(student_id__in=student_ids).values_list('student_id', flat=True)
+        )
+        outcomes = {}
+        candidates = []
+        for student_id in student_ids:
+            if student_id not in known:
+                outcomes[student_id] = NO_SUCH_STUDENT
+            elif student_id in registered:
+                outcomes[student_id] = ALREADY_REGISTERED
+            else:
+                outcomes[student_id] = ENROLLED
+                candidates.append(student_id)
+        while candidates and not reserve_seats(section.pk, len(candidates)):
+            seats = _seats_left(section.pk)
+            for student_id in candidates[seats:]:
+                outcomes[student_id] = SECTION_FULL
+            candidates = candidates[:seats]
+        registrations = [Registration(section=section, student=known[student_id]) for student_id in candidates]
+        for registration in registrations:
+            # set_sort_key is a pre_save receiver, and bulk_create sends none
+            registration.sort_key = registration.build_sort_key()
+        created = create_registrations(registrations, batch_size)
+        if len(created) < len(candidates):
+            # students a concurrent enrollment registered first
+            for student_id in set(candidates) - {registration.student_id for registration in created}:
+                outcomes[student_id] = ALREADY_REGISTERED
+            release_seats(section.pk, len(candidates) - len(created))
+        # bulk_create sends no post_save signals
+        transaction.on_commit(partial(adjust_cached_count, Registration, len(created)))
+        if created:
+            # what the registration signals would have touched
+            Section.objects.filter(pk=section.pk).touch()
+            Student.objects.filter(pk__in=[registration.student_id for registration in created]).touch()
+            bump_generation_on_commit(Registration)
+    return outcomes
@@ -0,0 +1,184 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from courseinfo.generations import bump_generation_on_commit
+from courseinfo.models import Course, Instructor, Period, Registration, Section, Semester, Student, Year
+from courseinfo.search import delete_fts_row, fts_available, sync_fts_row
+from courseinfo.services import SectionFull, release_seats, reserve_seats
+from courseinfo.sqlite import configure_connection
+from courseinfo.utils import adjust_cached_count, counted_models
+
+COUNTED_MODELS = (Student, Instructor, Section, Registration, Course, Semester)
+GENERATION_MODELS = COUNTED_MODELS + (Year, Period)
+
+
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(adjust_cached_count, sender, 1))
+
+
+def count_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(adjust_cached_count, sender, -1))
+
+
+for model in COUNTED_MODELS:
+    counted_models.add(model)
+    post_save.connect(count_created, sender=model, dispatch_uid='count_created_%s' % model._meta.model_name)
+    post_delete.connect(count_deleted, sender=model, dispatch_uid='count_deleted_%s' % model._meta.model_name)
+
+
+def model_changed(sender, **kwargs):
+    bump_generation_on_commit(sender)
+
+
+for model in GENERATION_MODELS:
+    post_save.connect(model_changed, sender=model, dispatch_uid='generation_saved_%s' % model._meta.model_name)
+    post_delete.connect(model_changed, sender=model, dispatch_uid='generation_deleted_%s' % model._meta.model_name)
+
+
+def search_saved(sender, instance, **kwargs):
+    if fts_available():
+        sync_fts_row(instance)
+
+
+def search_deleted(sender, instance, **kwargs):
+    if fts_available():
+        delete_fts_row(instance)
+
+
+for model in (Student, Instructor):
+    post_save.connect(search_saved, sender=model, dispatch_uid='search_saved_%s' % model._meta.model_name)
+    post_delete.connect(search_deleted, sender=model, dispatch_uid='search_deleted_%s' % model._meta.model_name)
+
+
+# Kept current below: updated_at, and so the ETag, of every detail page
+# showing a changed row, and the sort_key of every row built from it.
+# Course, Semester and Instructor pages also take the newest updated_at
+# of their sections (see ConditionalGetMixin), so a section's change
+# reaches them without touching their rows.
+
+def _touch_section_members(sections):
+    # registration and student pages show the section's label
+    Registration.objects.filter(section__in=sections).touch()
+    Student.objects.filter(registrations__section__in=sections).touch()
+
+
+def _refresh_section_sort_keys(sections):
+    sections.refresh_sort_keys()
+    Registration.objects.filter(section__in=sections).refresh_sort_keys()
+
+
+def remember_parents(sender, instance, raw=False, **kwargs):
+    # the rows it pointed to before this save lose it from their pages
+    if raw or instance._state.adding:
+        instance._previous_parents = {}
+    else:
+        fields = [field.attname for field in sender._meta.concrete_fields if field.is_relation]
+        instance._previous_parents = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def _parent_ids(instance, field):
+    attname = instance._meta.get_field(field).attname
+    return {getattr(instance, attname), getattr(instance, '_previous_parents', {}).get(attname)} - {None}
+
+
+def registration_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Section.objects.filter(pk__in=_parent_ids(instance, 'section')).touch()
+    Student.objects.filter(pk__in=_parent_ids(instance, 'student')).touch()
+
+
+def registration_seat_saving(sender, instance, raw=False, **kwargs):
+    # a new registration, or one moved to another section, takes a seat
+    # there before the row is written (the order bulk_enroll() locks in
+    # too); Registration.save() is atomic, so a failed write gives it back
+    if raw:
+        return
+    previous = instance._previous_parents.get('section_id')
+    if instance.section_id != previous:
+        if not reserve_seats(instance.section_id, 1):
+            raise SectionFull(instance.section)
+        if previous is not None:
+            release_seats(previous)
+
+
+def registration_seat_deleted(sender, instance, **kwargs):
+    release_seats(instance.section_id)
+
+
+def section_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # parents that gained or lost the section; a change of enrollment alone
+    # reaches them through the section's own updated_at
+    Course.objects.filter(pk__in=_parent_ids(instance, 'course')).touch()
+    Semester.objects.filter(pk__in=_parent_ids(instance, 'semester')).touch()
+    Instructor.objects.filter(pk__in=_parent_ids(instance, 'instructor')).touch()
+    if kwargs.get('created') is False:
+        _touch_section_members(Section.objects.filter(pk=instance.pk))
+        instance.registrations.refresh_sort_keys()
+
+
+def course_saved(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw):
+        sections = instance.sections.all()
+        sections.touch()
+        _touch_section_members(sections)
+        _refresh_section_sort_keys(sections)
+
+
+def instructor_saved(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw):
+        instance.sections.touch()
+
+
+def student_saved(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw):
+        instance.registrations.touch()
+        Section.objects.filter(registrations__student=instance).touch()
+        instance.registrations.refresh_sort_keys()
+
+
+def semester_saved(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw):
+        if sender is Semester:
+            semesters = Semester.objects.filter(pk=instance.pk)
+        else:
+            # a renamed year or period changes the label of its semesters
+            semesters = Semester.objects.filter(**{sender._meta.model_name: instance})
+            semesters.touch()
+            semesters.refresh_sort_keys()
+        sections = Section.objects.filter(semester__in=semesters)
+        sections.touch()
+        _touch_section_members(sections)
+        _refresh_section_sort_keys(sections)
+
+
+def set_sort_key(sender, instance, raw=False, **kwargs):
+    # a fixture brings its own sort_key
+    if not raw:
+        instance.sort_key = instance.build_sort_key()
+
+
+for model in (Semester, Section, Registration):
+    pre_save.connect(set_sort_key, sender=model, dispatch_uid='set_sort_key_%s' % model._meta.model_name)
+for model in (Registration, Section):
+    pre_save.connect(remember_parents, sender=model, dispatch_uid='remember_parents_%s' % model._meta.model_name)
+# after remember_parents, which gives it the section a registration leaves
+pre_save.connect(registration_seat_saving, sender=Registration, dispatch_uid='seat_registration_saving')
+post_delete.connect(registration_seat_deleted, sender=Registration, dispatch_uid='seat_registration_deleted')
+post_save.connect(registration_changed, sender=Registration, dispatch_uid='touch_registration_saved')
+post_delete.connect(registration_changed, sender=Registration, dispatch_uid='touch_registration_deleted')
+post_save.connect(section_changed, sender=Section, dispatch_uid='touch_section_saved')
+post_delete.connect(section_changed, sender=Section, dispatch_uid='touch_section_deleted')
+post_save.connect(course_saved, sender=Course, dispatch_uid='touch_course_saved')
+post_save.connect(instructor_saved, sender=Instructor, dispatch_uid='touch_instructor_saved')
+post_save.connect(student_saved, sender=Student, dispatch_uid='touch_student_saved')
+for model in (Semester, Year, Period):
+    post_save.connect(semester_saved, sender=model, dispatch_uid='touch_semester_saved_%s' % model._meta.model_name)
+
+connection_created.connect(configure_connection, dispatch_uid='courseinfo_sqlite_pragmas')
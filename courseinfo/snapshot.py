@@ -0,0 +1,193 @@
+"""Columnar enrollment snapshots for analytics.
+
+A snapshot is a directory of .npy files, one per column, plus a
+snapshot.json manifest. The registration table holds one row per
+registration, and every column in it is an integer code: the row
+number in the sections, courses, semesters, instructors or students
+dictionary table. Those tables hold the primary keys, names and section
+capacities the codes stand for. Codes use the smallest unsigned dtype
+that fits, and every file can be opened with np.load(mmap_mode='r'),
+so analysts read the snapshot without loading it or touching the live
+database. courseinfo.analytics computes its aggregates from one.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.utils import timezone
+
+from courseinfo.models import Course, Instructor, Registration, Section, Semester, Student
+
+MANIFEST = 'snapshot.json'
+VERSION = 1
+# capacity of a section with no seat limit
+UNLIMITED = -1
+
+
+def code_dtype(size):
+    """The smallest unsigned dtype that holds the codes 0..size - 1."""
+    return np.min_scalar_type(max(size - 1, 0))
+
+
+class InconsistentSnapshot(Exception):
+    pass
+
+
+def encode(keys, values):
+    """Return the row numbers of ``values`` in the sorted array ``keys``.
+
+    Raises InconsistentSnapshot if a value is not in keys; searchsorted()
+    would otherwise give it a neighbouring row's code.
+    """
+    codes = np.searchsorted(keys, values)
+    found = codes < len(keys)
+    found[found] = keys[codes[found]] == values[found]
+    if not found.all():
+        raise InconsistentSnapshot('%s keys are missing from their dictionary table, e.g. %s.' % (
+            np.count_nonzero(~found), values[~found][0]))
+    return codes.astype(code_dtype(len(keys)))
+
+
+def text_column(values):
+    # fixed-width unicode, so the column memory-maps like any other
+    return np.array(values, dtype=str) if values else np.array([], dtype='<U1')
+
+
+def read_tables(using, chunk_size=10000):
+    """Read the dictionary tables and the registration table as {table: {column: array}}.
+
+    Every dictionary table is ordered by primary key, so a primary key
+    is encoded with one searchsorted() and the registration columns are
+    gathered from the section columns without a Python loop.
+    """
+    courses = list(Course.objects.using(using).order_by('pk').values_list('pk', 'course_number', 'course_name'))
+    semesters = list(Semester.objects.using(using).order_by('pk').values_list(
+        'pk', 'year__year', 'period__period_name', 'sort_key'))
+    instructors = list(Instructor.objects.using(using).order_by('pk').values_list(
+        'pk', 'last_name', 'first_name', 'disambiguator'))
+    sections = list(Section.objects.using(using).order_by('pk').values_list(
+        'pk', 'section_name', 'capacity', 'course_id', 'semester_id', 'instructor_id'))
+    student_ids = np.fromiter(
+        Student.objects.using(using).order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size),
+        dtype=np.int64,
+    )
+    # (section, student) order walks the unique_registration index
+    registrations = np.fromiter(
+        Registration.objects.using(using).order_by('section_id', 'student_id').values_list(
+            'section_id', 'student_id').iterator(chunk_size=chunk_size),
+        dtype=[('section_id', np.int64), ('student_id', np.int64)],
+    )
+
+    course_ids = np.array([row[0] for row in courses], dtype=np.int64)
+    semester_ids = np.array([row[0] for row in semesters], dtype=np.int64)
+    instructor_ids = np.array([row[0] for row in instructors], dtype=np.int64)
+    section_ids = np.array([row[0] for row in sections], dtype=np.int64)
+    section_course = encode(course_ids, np.array([row[3] for row in sections], dtype=np.int64))
+    section_semester = encode(semester_ids, np.array([row[4] for row in sections], dtype=np.int64))
+    section_instructor = encode(instructor_ids, np.array([row[5] for row in sections], dtype=np.int64))
+    registration_section = encode(section_ids, registrations['section_id'])
+    return {
+        'courses': {
+            'course_id': course_ids,
+            'course_number': text_column([row[1] for row in courses]),
+            'course_name': text_column([row[2] for row in courses]),
+        },
+        'semesters': {
+            'semester_id': semester_ids,
+            'year': np.array([row[1] for row in semesters], dtype=np.int32),
+            'period_name': text_column([row[2] for row in semesters]),
+            # argsort of sort_key puts the semesters in calendar order
+            'sort_key': text_column([row[3] for row in semesters]),
+        },
+        'instructors': {
+            'instructor_id': instructor_ids,
+            'last_name': text_column([row[1] for row in instructors]),
+            'first_name': text_column([row[2] for row in instructors]),
+            'disambiguator': text_column([row[3] for row in instructors]),
+        },
+        'sections': {
+            'section_id': section_ids,
+            'section_name': text_column([row[1] for row in sections]),
+            'capacity': np.array(
+                [UNLIMITED if row[2] is None else row[2] for row in sections], dtype=np.int32),
+            'course': section_course,
+            'semester': section_semester,
+            'instructor': section_instructor,
+        },
+        'students': {
+            'student_id': student_ids,
+        },
+        'registrations': {
+            'section': registration_section,
+            'course': section_course[registration_section],
+            'semester': section_semester[registration_section],
+            'instructor': section_instructor[registration_section],
+            'student': encode(student_ids, registrations['student_id']),
+        },
+    }
+
+
+def write_snapshot(path, using=None):
+    """Write a snapshot of the current enrollment to the directory ``path``.
+
+    The tables are read in one transaction, from a read replica when
+    courseinfo.replicas routes reads to one, so they agree with each
+    other; on PostgreSQL that transaction is REPEATABLE READ. Should a
+    key still be missing from its dictionary table, InconsistentSnapshot
+    is raised and nothing is written. The files are written next to ``path`` and moved into place
+    when complete; readers that still have the old snapshot mapped keep
+    reading it. Returns the manifest.
+    """
+    using = using or router.db_for_read(Registration) or DEFAULT_DB_ALIAS
+    connection = connections[using]
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if outermost and connection.vendor == 'postgresql':
+            # under the default READ COMMITTED every SELECT would see its
+            # own snapshot; SQLite reads a transaction from one already.
+            # This has to be the transaction's first statement.
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        tables = read_tables(using)
+    path = os.path.abspath(path)
+    staging = path + '.new'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    manifest = {'version': VERSION, 'created_at': timezone.now().isoformat(), 'database': using, 'tables': {}}
+    for table, columns in tables.items():
+        for column, values in columns.items():
+            np.save(os.path.join(staging, '%s.%s.npy' % (table, column)), values, allow_pickle=False)
+        manifest['tables'][table] = {
+            'rows': len(next(iter(columns.values()))),
+            'columns': {column: values.dtype.str for column, values in columns.items()},
+        }
+    with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    if os.path.exists(path):
+        retired = path + '.old'
+        shutil.rmtree(retired, ignore_errors=True)
+        os.rename(path, retired)
+        os.rename(staging, path)
+        shutil.rmtree(retired)
+    else:
+        os.rename(staging, path)
+    return manifest
+
+
+def load_snapshot(path, mmap_mode='r'):
+    """Return {table: {column: array}} for the snapshot in ``path``, memory-mapped by default."""
+    with open(os.path.join(path, MANIFEST), encoding='utf-8') as file:
+        manifest = json.load(file)
+    if manifest['version'] != VERSION:
+        raise ValueError('%s holds a version %s snapshot; expected version %s.' % (
+            path, manifest['version'], VERSION))
+    return {
+        table: {
+            column: np.load(os.path.join(path, '%s.%s.npy' % (table, column)), mmap_mode=mmap_mode,
+                            allow_pickle=False)
+            for column in details['columns']
+        }
+        for table, details in manifest['tables'].items()
+    }
@@ -0,0 +1,35 @@
+from django.conf import settings
+
+# Applied to every new SQLite connection when COURSEINFO_SQLITE_TUNING is
+# on; COURSEINFO_SQLITE_PRAGMAS replaces the whole dict. journal_mode is
+# the only one stored in the database file; the rest last for the connection.
+PRAGMAS = {
+    # readers no longer block the writer, nor the writer readers
+    'journal_mode': 'WAL',
+    # wait up to 5 s for the write lock instead of failing at once
+    'busy_timeout': 5000,
+    # with WAL, fsync at checkpoints only; a power cut can lose the last
+    # commits but never corrupts the file
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # negative means KiB: a 64 MiB page cache per connection
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+def tuning_enabled():
+    return getattr(settings, 'COURSEINFO_SQLITE_TUNING', False)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver that applies the pragmas to SQLite connections."""
+    if connection.vendor != 'sqlite' or not tuning_enabled():
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, getattr(settings, 'COURSEINFO_SQLITE_PRAGMAS', PRAGMAS))
@@ -0,0 +1,22 @@
+// Fill the datalist of an autocomplete input from its JSON endpoint.
+document.addEventListener('input', function (event) {
+    var input = event.target;
+    var url = input.getAttribute('data-autocomplete-url');
+    if (!url || input.value.length < 2 || /^\d+$/.test(input.value)) {
+        return;
+    }
+    fetch(url + '?q=' + encodeURIComponent(input.value), {credentials: 'same-origin'})
+        .then(function (response) {
+            return response.json();
+        })
+        .then(function (data) {
+            var options = document.getElementById(input.getAttribute('list'));
+            options.innerHTML = '';
+            data.results.forEach(function (result) {
+                var option = document.createElement('option');
+                option.value = result.id;
+                option.textContent = result.text;
+                options.appendChild(option);
+            });
+        });
+});
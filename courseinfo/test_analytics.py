@@ -0,0 +1,108 @@
+import os
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from courseinfo.analytics import fill_rates, instructor_loads, semester_totals
+from courseinfo.models import Course, Instructor, Period, Registration, Section, Semester, Student, Year
+from courseinfo.snapshot import UNLIMITED, InconsistentSnapshot, encode, load_snapshot, write_snapshot
+
+
+class TestEncode(SimpleTestCase):
+    def test_codes_are_row_numbers(self):
+        codes = encode(np.array([3, 5, 9]), np.array([9, 3, 5, 5]))
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertEqual(list(codes), [2, 0, 1, 1])
+
+    def test_missing_key_is_refused(self):
+        # between two keys, and past the last one
+        for value in (4, 10):
+            with self.subTest(value=value), self.assertRaises(InconsistentSnapshot):
+                encode(np.array([3, 5, 9]), np.array([3, value]))
+
+
+class TestEnrollmentSnapshot(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        spring = Period.objects.create(period_sequence=1, period_name='Spring')
+        fall = Period.objects.create(period_sequence=3, period_name='Fall')
+        year = Year.objects.create(year=2022)
+        cls.spring = Semester.objects.create(year=year, period=spring)
+        cls.fall = Semester.objects.create(year=year, period=fall)
+        cls.saoji = Instructor.objects.create(first_name='Saurabh', last_name='Saoji', disambiguator='UIUC')
+        cls.trainor = Instructor.objects.create(first_name='Kevin', last_name='Trainor', disambiguator='')
+        web = Course.objects.create(course_number='IS439', course_name='Web Development')
+        data = Course.objects.create(course_number='IS445', course_name='Data Visualization')
+        sections = [
+            Section.objects.create(section_name='OAG', semester=cls.spring, course=web,
+                                   instructor=cls.saoji, capacity=4),
+            Section.objects.create(section_name='OAH', semester=cls.spring, course=web,
+                                   instructor=cls.saoji, capacity=2),
+            Section.objects.create(section_name='AL1', semester=cls.spring, course=data, instructor=cls.saoji),
+            Section.objects.create(section_name='AL1', semester=cls.fall, course=data,
+                                   instructor=cls.trainor, capacity=10),
+        ]
+        students = [
+            Student.objects.create(first_name='Student%s' % number, last_name='Snapshot', disambiguator='')
+            for number in range(4)
+        ]
+        for section, registered in zip(sections, (students[:2], students[:2], students[1:], students[3:])):
+            for student in registered:
+                Registration.objects.create(section=section, student=student)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'snapshot')
+        write_snapshot(self.path)
+        self.snapshot = load_snapshot(self.path)
+
+    def test_snapshot_is_memory_mapped_and_coded(self):
+        registrations = self.snapshot['registrations']
+        self.assertIsInstance(registrations['section'], np.memmap)
+        self.assertEqual(len(registrations['section']), 8)
+        self.assertEqual(registrations['semester'].dtype, np.uint8)
+        sections = self.snapshot['sections']
+        self.assertEqual(list(sections['capacity']), [4, 2, UNLIMITED, 10])
+        instructors = self.snapshot['instructors']['last_name']
+        self.assertEqual(list(instructors[sections['instructor']]), ['Saoji', 'Saoji', 'Saoji', 'Trainor'])
+
+    def test_rewrite_replaces_the_snapshot(self):
+        Registration.objects.filter(section__semester=self.fall).delete()
+        write_snapshot(self.path)
+        self.assertEqual(len(load_snapshot(self.path)['registrations']['section']), 7)
+        # the old arrays stay readable while they are mapped
+        self.assertEqual(len(self.snapshot['registrations']['section']), 8)
+
+    def test_fill_rates(self):
+        rates = fill_rates(self.snapshot)
+        self.assertEqual(list(rates['enrolled']), [2, 2, 3, 1])
+        np.testing.assert_allclose(rates['fill_rate'], [0.5, 1.0, np.nan, 0.1])
+
+    def test_semester_totals(self):
+        totals = semester_totals(self.snapshot)
+        self.assertEqual(list(totals['period_name']), ['Spring', 'Fall'])
+        self.assertEqual(list(totals['sections']), [3, 1])
+        self.assertEqual(list(totals['registrations']), [7, 1])
+        self.assertEqual(list(totals['students']), [4, 1])
+        self.assertEqual(list(totals['seats']), [6, 10])
+        np.testing.assert_allclose(totals['fill_rate'], [4 / 6, 0.1])
+
+    def test_instructor_loads(self):
+        loads = instructor_loads(self.snapshot)
+        self.assertEqual(list(loads['instructor_id']), [self.saoji.pk, self.trainor.pk])
+        self.assertEqual(list(loads['sections']), [3, 1])
+        self.assertEqual(list(loads['courses']), [2, 1])
+        self.assertEqual(list(loads['registrations']), [7, 1])
+        fall = instructor_loads(self.snapshot, semester_id=self.fall.pk)
+        self.assertEqual(list(fall['sections']), [0, 1])
+        with self.assertRaises(ValueError):
+            instructor_loads(self.snapshot, semester_id=0)
+
+    def test_empty_snapshot(self):
+        Registration.objects.all().delete()
+        write_snapshot(self.path)
+        snapshot = load_snapshot(self.path)
+        self.assertEqual(list(fill_rates(snapshot)['enrolled']), [0, 0, 0, 0])
+        self.assertEqual(list(semester_totals(snapshot)['students']), [0, 0])
@@ -0,0 +1,309 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from courseinfo import imports
+from courseinfo.models import Instructor, Registration, Section, Student
+from courseinfo.search import fts_available, search_people
+from courseinfo.test_data_initialize import initialize_registration_data
+from courseinfo.utils import cached_count
+
+
+class TestRepairEnrollmentCounts(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+        for number in range(4):
+            Section.objects.create(section_name='AL%s' % number, semester_id=1, course_id=1, instructor_id=1)
+        # drift, as a write that bypasses the registration receivers leaves it
+        Section.objects.filter(pk=1).update(enrollment_count=0)
+        Section.objects.filter(section_name='AL2').update(enrollment_count=3)
+
+    def test_dry_run_reports_drift_only(self):
+        out = StringIO()
+        call_command('repair_enrollment_counts', '--dry-run', '--batch-size=2', stdout=out)
+        self.assertIn('Checked 5 sections, found 2 with drifted enrollment counts.', out.getvalue())
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 0)
+
+    def test_repairs_drift_in_batches(self):
+        out = StringIO()
+        call_command('repair_enrollment_counts', '--batch-size=2', stdout=out)
+        self.assertIn('Section 1: stored 0, actual 1', out.getvalue())
+        self.assertIn('Checked 5 sections, repaired 2 with drifted enrollment counts.', out.getvalue())
+        self.assertEqual(
+            list(Section.objects.order_by('pk').values_list('enrollment_count', flat=True)), [1, 0, 0, 0, 0]
+        )
+
+
+class TestBenchmarkSqlite(TestCase):
+    def test_reports_both_profiles(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', '--seconds=0.2', '--readers=2', '--writers=2', '--sections=20', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ['default', 'tuned'])
+
+
+class TestRefreshReplica(TestCase):
+    @override_settings(COURSEINFO_READ_REPLICAS=[])
+    def test_needs_a_replica(self):
+        with self.assertRaisesMessage(CommandError, 'No replicas configured'):
+            call_command('refresh_replica')
+
+    def test_unknown_database(self):
+        with self.assertRaisesMessage(CommandError, 'nowhere is not in DATABASES.'):
+            call_command('refresh_replica', '--database=nowhere')
+
+
+class TestBenchmarkPostgresPool(TestCase):
+    def test_needs_the_pooled_backend(self):
+        with self.assertRaisesMessage(CommandError, 'must use courseinfo.db_backends.postgresql_pool'):
+            call_command('benchmark_postgres_pool', 'admin')
+
+
+class TestImportPeople(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Student.objects.create(first_name='Kevin', last_name='Trainor', disambiguator='UIUC')
+
+    def write_file(self, name, content):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def call(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_people', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_csv_in_chunks(self):
+        path = self.write_file('students.csv', (
+            'first_name,last_name,disambiguator\n'
+            '  Ada , Lovelace ,\n'
+            'Kevin,Trainor,UIUC\n'
+            'Grace,Hopper,  Navy  \n'
+            'Ada,Lovelace,\n'
+            ',Nameless,\n'
+            'Alan,Turing,Bletchley\n'
+        ))
+        out, err = self.call('student', path, '--batch-size=2')
+        self.assertIn('Created 3 students, skipped 2 duplicates, rejected 1 records', out)
+        self.assertEqual(err.strip(), 'Line 6: first_name is required')
+        self.assertEqual(
+            set(Student.objects.values_list('last_name', 'first_name', 'disambiguator')),
+            {('Trainor', 'Kevin', 'UIUC'), ('Lovelace', 'Ada', ''), ('Hopper', 'Grace', 'Navy'),
+             ('Turing', 'Alan', 'Bletchley')},
+        )
+
+    def test_imports_jsonl(self):
+        path = self.write_file('instructors.jsonl', (
+            '{"first_name": "Barbara", "last_name": "Liskov"}\n'
+            '\n'
+            '{"first_name": "Edsger", "last_name": "Dijkstra", "disambiguator": "EWD"}\n'
+            '{"first_name": "Donald", "last_name": 7}\n'
+            'not json\n'
+        ))
+        out, err = self.call('instructor', path)
+        self.assertIn('Created 2 instructors, skipped 0 duplicates, rejected 2 records', out)
+        self.assertIn('Line 4: last_name is not text', err)
+        self.assertIn('Line 5: not valid JSON', err)
+        self.assertEqual(Instructor.objects.count(), 2)
+
+    @override_settings(COURSEINFO_SEARCH_FTS=True)
+    def test_imported_people_are_searchable(self):
+        if not fts_available():
+            self.skipTest('SQLite without FTS5')
+        path = self.write_file('students.csv', 'first_name,last_name\nGrace,Hopper\n')
+        self.call('student', path)
+        self.assertEqual([student.first_name for student in search_people(Student.objects.all(), 'hop')],
+                         ['Grace'])
+
+    def test_unknown_format(self):
+        with self.assertRaisesMessage(CommandError, 'Cannot tell the format'):
+            self.call('student', self.write_file('students.txt', ''))
+
+    def test_person_stored_concurrently_is_skipped(self):
+        existing_people = imports.existing_people
+        calls = []
+
+        def stored_meanwhile(model, keys):
+            stored = existing_people(model, keys)
+            if not calls:
+                # another import stores Grace Hopper between the lookup and the insert
+                Student.objects.create(first_name='Grace', last_name='Hopper', disambiguator='')
+            calls.append(stored)
+            return stored
+
+        path = self.write_file('students.csv', 'first_name,last_name\nGrace,Hopper\nAlan,Turing\n')
+        with mock.patch('courseinfo.imports.existing_people', side_effect=stored_meanwhile):
+            out, err = self.call('student', path)
+        self.assertIn('Created 1 students, skipped 1 duplicates, rejected 0 records', out)
+        self.assertEqual(Student.objects.filter(last_name__in=['Hopper', 'Turing']).count(), 2)
+
+    def test_undecodable_file(self):
+        path = self.write_file('students.csv', '')
+        with open(path, 'wb') as file:
+            file.write(b'first_name,last_name\nGr\xe2ce,Hopper\n')
+        with self.assertRaisesMessage(CommandError, 'Cannot read %s' % path):
+            self.call('student', path)
+
+
+class TestImportRegistrations(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+        cls.trainor = Student.objects.create(first_name='Kevin', last_name='Trainor', disambiguator='UIUC')
+
+    def write_file(self, name, content):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_imports_csv_and_reports_rejects(self):
+        path = self.write_file('registrations.csv', (
+            'last_name,first_name,disambiguator,course_number,section_name,year,period\n'
+            'Trainor,Kevin,UIUC,IS439,OAG,2022,Spring\n'
+            'Saoji,Saurabh,UIUC,IS439,OAG,2022,Spring\n'
+            'Trainor, Kevin ,UIUC, IS439 ,OAG,2022,Spring\n'
+            'Nobody,Known,,IS439,OAG,2022,Spring\n'
+            'Trainor,Kevin,UIUC,IS439,OAG,next,Spring\n'
+            'Trainor,Kevin,UIUC,IS439,ZZZ,2022,Spring\n'
+        ))
+        rejects = os.path.join(os.path.dirname(path), 'rejects.csv')
+        out = StringIO()
+        call_command('import_registrations', path, '--workers=0', '--batch-size=2', '--rejects', rejects,
+                     stdout=out)
+        self.assertIn('Created 1 registrations, skipped 2 duplicates, rejected 3 records', out.getvalue())
+        registration = Registration.objects.get(student=self.trainor)
+        self.assertEqual(registration.section_id, 1)
+        self.assertEqual(registration.sort_key, registration.build_sort_key())
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 2)
+        with open(rejects, encoding='utf-8') as file:
+            self.assertEqual(file.read().splitlines(), [
+                'line,reason,record',
+                '5,"no student Nobody, Known ()","Nobody,Known,,IS439,OAG,2022,Spring"',
+                "6,year 'next' is not a number,\"Trainor,Kevin,UIUC,IS439,OAG,next,Spring\"",
+                '7,no section IS439 ZZZ in 2022 Spring,"Trainor,Kevin,UIUC,IS439,ZZZ,2022,Spring"',
+            ])
+
+    def test_concurrent_registration_is_not_counted(self):
+        create_registrations = imports.create_registrations
+
+        def registered_meanwhile(registrations):
+            # another request registers the student between the lookup and the insert
+            Registration.objects.create(section_id=1, student=self.trainor)
+            return create_registrations(registrations)
+
+        cache.clear()
+        self.assertEqual(cached_count(Registration.objects.all()), 1)
+        with mock.patch('courseinfo.imports.create_registrations', side_effect=registered_meanwhile):
+            with self.captureOnCommitCallbacks(execute=True):
+                created, duplicates = imports.write_registrations([(1, self.trainor.pk, 'key')])
+        self.assertEqual((created, duplicates), (0, 1))
+        # only the other request's registration is counted
+        self.assertEqual(cached_count(Registration.objects.all()), 2)
+
+    def test_unreadable_csv_line_is_rejected(self):
+        path = self.write_file('registrations.csv', (
+            'last_name,first_name,disambiguator,course_number,section_name,year,period\n'
+            'Trainor,Kevin,UIUC,IS439,OAG,2022,%s\n'
+            'Trainor,Kevin,UIUC,IS439,OAG,2022,Spring\n' % ('x' * 200)
+        ))
+        limit = csv.field_size_limit(100)
+        self.addCleanup(csv.field_size_limit, limit)
+        out, err = StringIO(), StringIO()
+        call_command('import_registrations', path, '--workers=0', stdout=out, stderr=err)
+        self.assertIn('Created 1 registrations, skipped 0 duplicates, rejected 1 records', out.getvalue())
+        self.assertIn('Line 2: not valid CSV (field larger than field limit (100))', err.getvalue())
+
+    def test_unterminated_quote_is_rejected(self):
+        # one bad line starts the first chunk and one ends the second, so
+        # neither can run into the lines after it
+        path = self.write_file('registrations.csv', (
+            'last_name,first_name,disambiguator,course_number,section_name,year,period\n'
+            'Smith,"John,,IS439,OAG,2022,Spring\n'
+            'Saoji,Saurabh,UIUC,IS439,OAG,2022,Spring\n'
+            'Trainor,Kevin,UIUC,IS439,OAG,2022,Spring\n'
+            'Trainor,"Kevin,UIUC,IS439,OAG,2022,Spring\n'
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_registrations', path, '--workers=0', '--batch-size=2', stdout=out, stderr=err)
+        self.assertIn('Created 1 registrations, skipped 1 duplicates, rejected 2 records', out.getvalue())
+        self.assertEqual(err.getvalue().splitlines(), [
+            'Line 2: not valid CSV (unexpected end of data)',
+            'Line 5: not valid CSV (unexpected end of data)',
+        ])
+        self.assertTrue(Registration.objects.filter(student=self.trainor, section_id=1).exists())
+
+    def test_undecodable_file(self):
+        path = self.write_file('registrations.csv', '')
+        with open(path, 'wb') as file:
+            file.write(b'last_name,first_name\nTr\xe2inor,Kevin\n')
+        with self.assertRaisesMessage(CommandError, 'Cannot read %s' % path):
+            call_command('import_registrations', path, '--workers=0', stdout=StringIO())
+
+    def test_parses_jsonl_in_worker_processes(self):
+        path = self.write_file('registrations.jsonl', (
+            '{"last_name": "Trainor", "first_name": "Kevin", "disambiguator": "UIUC", '
+            '"course_number": "IS439", "section_name": "OAG", "year": 2022, "period": "Spring"}\n'
+            '{"last_name": "Trainor", "first_name": "Kevin", "course_number": "IS439", '
+            '"section_name": "OAG", "year": 2022, "period": "Fall"}\n'
+            '[1, 2]\n'
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_registrations', path, '--workers=2', '--batch-size=1', stdout=out, stderr=err)
+        self.assertIn('Created 1 registrations, skipped 0 duplicates, rejected 2 records', out.getvalue())
+        self.assertEqual(err.getvalue().splitlines(), ['Line 2: no semester 2022 Fall', 'Line 3: not an object'])
+        self.assertTrue(Registration.objects.filter(student=self.trainor, section_id=1).exists())
+
+
+class TestExportRegistrations(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+
+    def test_export_loads_back(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'registrations.csv')
+        out = StringIO()
+        call_command('export_registrations', '--output', path, '--course=1', stdout=out)
+        self.assertIn('Wrote 1 registrations', out.getvalue())
+        out = StringIO()
+        call_command('import_registrations', path, '--workers=0', stdout=out)
+        self.assertIn('Created 0 registrations, skipped 1 duplicates, rejected 0 records', out.getvalue())
+
+    def test_export_to_stdout(self):
+        out = StringIO()
+        call_command('export_registrations', '--format=jsonl', '--semester=1', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['section_name'], 'OAG')
+        out = StringIO()
+        call_command('export_registrations', '--section=2', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+
+
+class TestSnapshotEnrollment(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+
+    def test_writes_snapshot(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'snapshot')
+        out = StringIO()
+        call_command('snapshot_enrollment', path, stdout=out)
+        self.assertIn('Wrote 1 registrations, 1 sections, 1 courses, 1 semesters and 1 instructors', out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(path, 'snapshot.json')))
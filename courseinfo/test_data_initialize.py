@@ -1,3 +1,5 @@
+from django.contrib.auth.models import User
+
 from courseinfo.models import Course, Period, Year, Student, Instructor, Semester, Section, Registration
 
 
@@ -53,3 +55,7 @@ def initialize_registration_data():
     student = Student.objects.create(first_name='Saurabh', last_name='Saoji', disambiguator='UIUC')
     section1 = Section.objects.create(section_name='OAG', semester=semester1, course=course1, instructor=instructor1)
     Registration.objects.create(section=section1, student=student)
+
+
+def initialize_user_data():
+    return User.objects.create_superuser(username='registrar', email='registrar@example.com', password='registrar')
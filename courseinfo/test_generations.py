@@ -0,0 +1,82 @@
+import tempfile
+
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+
+from courseinfo.generations import bump_generation, generation_key, get_generation, get_generations, \
+    versioned_key
+from courseinfo.models import Course, Registration, Section, Student
+from courseinfo.services import bulk_enroll, enroll, recount_enrollments
+from courseinfo.test_data_initialize import initialize_registration_data
+
+
+class TestGenerations(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_moves_the_generation_forward(self):
+        before = get_generation(Course)
+        bump_generation(Course)
+        self.assertGreater(get_generation(Course), before)
+
+    def test_bump_only_touches_the_given_models(self):
+        course, section = get_generations([Course, Section])
+        bump_generation(Section)
+        self.assertEqual(get_generation(Course), course)
+        self.assertNotEqual(get_generation(Section), section)
+
+    def test_lost_generation_is_never_reused(self):
+        bump_generation(Course)
+        before = get_generation(Course)
+        cache.delete(generation_key(Course))
+        self.assertNotEqual(get_generation(Course), before)
+
+    def test_versioned_key_follows_generations_and_parts(self):
+        key = versioned_key('page', [Course, Section], '/course/')
+        self.assertEqual(versioned_key('page', [Course, Section], '/course/'), key)
+        self.assertNotEqual(versioned_key('page', [Course, Section], '/course/?page=2'), key)
+        bump_generation(Section)
+        self.assertNotEqual(versioned_key('page', [Course, Section], '/course/'), key)
+
+    def test_file_cache_bumps_are_seen_by_other_processes(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                bump_generation(Course)
+                # another worker has its own cache object over the same directory
+                other_worker = FileBasedCache(location, {})
+                self.assertEqual(other_worker.get(generation_key(Course)), get_generation(Course))
+
+
+class TestGenerationBumps(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def assertBumps(self, model, operation):
+        before = get_generation(model)
+        with self.captureOnCommitCallbacks(execute=True):
+            operation()
+        self.assertNotEqual(get_generation(model), before)
+
+    def test_saving_bumps_the_model(self):
+        course = Course.objects.get(pk=1)
+        self.assertBumps(Course, course.save)
+
+    def test_deleting_bumps_the_model(self):
+        self.assertBumps(Registration, Registration.objects.get(pk=1).delete)
+
+    def test_bulk_enroll_bumps_registrations(self):
+        student = Student.objects.create(first_name='Bulk', last_name='Cohort', disambiguator='')
+        self.assertBumps(Registration, lambda: bulk_enroll(Section.objects.get(pk=1), [student.pk]))
+
+    def test_seat_counter_updates_bump_sections(self):
+        student = Student.objects.create(first_name='Seat', last_name='Taker', disambiguator='')
+        self.assertBumps(Section, lambda: enroll(Section.objects.get(pk=1), student))
+        self.assertBumps(Section, lambda: recount_enrollments([1]))
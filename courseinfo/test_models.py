@@ -1,4 +1,7 @@
+from unittest import mock
+
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
 from .models import Period, Course, Student, Instructor, Year, Semester, Section, Registration
 from .test_data_initialize import initialize_year_data, initialize_period_data, initialize_course_data, \
@@ -142,7 +145,90 @@ class RegistrationModelTest(TestCase):
             registration.full_clean()
 
 
-
-
-
-
+class SortKeyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+        cls.spring_2022 = Semester.objects.get()
+        cls.fall_2021 = Semester.objects.create(
+            year=Year.objects.create(year=2021), period=Period.objects.create(period_sequence=3, period_name='Fall'),
+        )
+        cls.web = Course.objects.get(course_number='IS439')
+        cls.database = Course.objects.create(course_number='IS455', course_name='Database Design')
+        instructor = Instructor.objects.get()
+        cls.web_2021 = Section.objects.create(
+            section_name='OAG', semester=cls.fall_2021, course=cls.web, instructor=instructor)
+        cls.database_2022 = Section.objects.create(
+            section_name='AOG', semester=cls.spring_2022, course=cls.database, instructor=instructor)
+        cls.web_2022 = Section.objects.get(semester=cls.spring_2022, course=cls.web)
+        cls.saoji = Student.objects.get()
+        cls.adams = Student.objects.create(first_name='Ann', last_name='Adams')
+        Registration.objects.create(section=cls.web_2022, student=cls.adams)
+
+    def test_orderings_match_the_joined_ones(self):
+        self.assertEqual(
+            list(Semester.objects.all()),
+            list(Semester.objects.order_by('year__year', 'period__period_sequence')),
+        )
+        self.assertEqual(
+            list(Section.objects.all()),
+            list(Section.objects.order_by('course', 'section_name', 'semester')),
+        )
+        self.assertEqual(
+            list(Registration.objects.all()),
+            list(Registration.objects.order_by('section', 'student')),
+        )
+        self.assertEqual(list(Section.objects.all()), [self.web_2021, self.web_2022, self.database_2022])
+
+    def test_renames_reach_dependent_sort_keys(self):
+        self.web.course_number = 'IS999'
+        self.web.save()
+        self.assertEqual(list(Section.objects.all()), [self.database_2022, self.web_2021, self.web_2022])
+        self.saoji.last_name = 'Aaron'
+        self.saoji.save()
+        self.assertEqual(
+            [registration.student for registration in Registration.objects.filter(section=self.web_2022)],
+            [self.saoji, self.adams],
+        )
+        year = self.fall_2021.year
+        year.year = 2023
+        year.save()
+        self.assertEqual(list(Semester.objects.all()), [self.spring_2022, self.fall_2021])
+        self.assertEqual(list(Section.objects.all()), [self.database_2022, self.web_2022, self.web_2021])
+
+    def test_moved_section_moves_its_registrations(self):
+        self.web_2022.course = self.database
+        self.web_2022.section_name = 'ZZZ'
+        self.web_2022.save()
+        self.assertEqual(
+            Registration.objects.filter(section=self.web_2022).first().sort_key.split('\x1f')[:3],
+            ['IS455', 'Database Design', 'ZZZ'],
+        )
+
+    def test_course_number_prefix_sorts_first(self):
+        # under a collation that skips the separator, 'IS439<US>Web' would sort after 'IS4391<US>...'
+        longer = Course.objects.create(course_number='IS4391', course_name='Accessibility')
+        section = Section.objects.create(
+            section_name='OAG', semester=self.spring_2022, course=longer, instructor=Instructor.objects.get())
+        self.assertEqual(list(Section.objects.all()), [self.web_2021, self.web_2022, section, self.database_2022])
+
+    def test_sort_keys_use_a_binary_collation(self):
+        field = Section._meta.get_field('sort_key')
+        self.assertIsNone(field.db_parameters(connection)['collation'])
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(field.db_parameters(connection)['collation'], 'C')
+
+    def test_default_orderings_sort_on_an_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite syntax.')
+        for queryset in (
+            Semester.objects.all(),
+            Section.objects.all(),
+            Section.objects.with_related(),
+            Registration.objects.all(),
+            Registration.objects.with_related(),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                plan = queryset.explain()
+                self.assertRegex(plan, r'SCAN courseinfo_\w+ USING INDEX courseinfo_\w+_sort_key')
+                self.assertNotIn('TEMP B-TREE', plan)
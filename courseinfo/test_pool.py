@@ -0,0 +1,116 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from courseinfo.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.healthy = True
+        self.dirty = False
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def check(connection):
+    if not connection.healthy:
+        raise ConnectionError('server closed the connection')
+
+
+def reset(connection):
+    connection.dirty = False
+
+
+class TestConnectionPool(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, check, reset, **kwargs)
+
+    def test_returned_connection_is_reused(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        connection.dirty = True
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        self.assertFalse(connection.dirty)
+        self.assertEqual(len(self.opened), 1)
+        stats = pool.stats()
+        self.assertEqual((stats['checkouts'], stats['connections_opened']), (2, 1))
+        self.assertEqual((stats['size'], stats['idle'], stats['in_use']), (1, 0, 1))
+
+    def test_unhealthy_connection_is_replaced_on_checkout(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.healthy = False
+        replacement = pool.getconn()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['closed_unhealthy'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_connection_past_max_lifetime_is_closed(self):
+        pool = self.make_pool(max_lifetime=60)
+        with mock.patch('courseinfo.pool.time.monotonic', return_value=1000.0):
+            connection = pool.getconn()
+        with mock.patch('courseinfo.pool.time.monotonic', return_value=1030.0):
+            pool.putconn(connection)
+        with mock.patch('courseinfo.pool.time.monotonic', return_value=1061.0):
+            self.assertIsNot(pool.getconn(), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['closed_expired'], 1)
+
+    def test_discarded_connection_frees_its_slot(self):
+        pool = self.make_pool(max_size=1)
+        connection = pool.getconn()
+        pool.putconn(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(), connection)
+
+    def test_full_pool_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_full_pool_waits_for_a_returned_connection(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, [connection])
+        timer.start()
+        self.assertIs(pool.getconn(), connection)
+        timer.join()
+        self.assertEqual(pool.stats()['waits'], 1)
+        self.assertGreater(pool.stats()['wait_seconds'], 0)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = ConnectionPool(mock.Mock(side_effect=ConnectionError), check, reset, max_size=1)
+        for attempt in range(2):
+            with self.assertRaises(ConnectionError):
+                pool.getconn()
+        self.assertEqual(pool.stats()['connect_errors'], 2)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class TestDatabasePoolStats(TestCase):
+    def test_superuser_only(self):
+        url = reverse('courseinfo_database_pool_urlpattern')
+        self.client.force_login(User.objects.create_user('staff'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_superuser('admin'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
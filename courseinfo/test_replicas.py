@@ -0,0 +1,90 @@
+import contextvars
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from courseinfo.models import Course
+from courseinfo.replicas import PIN_SESSION_KEY, ReplicaPinningMiddleware, ReplicaRouter, copy_sqlite_database
+from courseinfo.test_data_initialize import initialize_course_data
+
+
+def in_new_context(function):
+    # a fresh context, as a new request has, whatever this thread wrote before
+    return contextvars.Context().run(function)
+
+
+@override_settings(COURSEINFO_READ_REPLICAS=['replica'])
+class TestReplicaRouter(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_go_to_a_replica(self):
+        self.assertEqual(in_new_context(lambda: self.router.db_for_read(Course)), 'replica')
+
+    def test_writes_go_to_default_and_pin_the_request(self):
+        def write_then_read():
+            return self.router.db_for_write(Course), self.router.db_for_read(Course)
+        self.assertEqual(in_new_context(write_then_read), ('default', None))
+
+    def test_other_apps_stay_on_default(self):
+        self.assertIsNone(in_new_context(lambda: self.router.db_for_read(User)))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'courseinfo'))
+        self.assertTrue(self.router.allow_migrate('default', 'courseinfo'))
+
+    @override_settings(COURSEINFO_READ_REPLICAS=[])
+    def test_no_replicas_means_default(self):
+        self.assertIsNone(in_new_context(lambda: self.router.db_for_read(Course)))
+
+
+@override_settings(COURSEINFO_READ_REPLICAS=['replica'], COURSEINFO_REPLICA_PIN_SECONDS=30)
+class TestReplicaPinningMiddleware(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def request(self, session, view):
+        request = RequestFactory().get('/')
+        request.session = session
+        reads = []
+
+        def get_response(request):
+            reads.append(view())
+            return HttpResponse()
+
+        in_new_context(lambda: ReplicaPinningMiddleware(get_response)(request))
+        return reads[0]
+
+    def test_writing_pins_the_session(self):
+        session = {}
+        self.request(session, lambda: self.router.db_for_write(Course))
+        self.assertGreater(session[PIN_SESSION_KEY], time.time() + 20)
+        self.assertIsNone(self.request(session, lambda: self.router.db_for_read(Course)))
+
+    def test_pin_expires(self):
+        session = {PIN_SESSION_KEY: time.time() - 1}
+        self.assertEqual(self.request(session, lambda: self.router.db_for_read(Course)), 'replica')
+
+    def test_reading_does_not_pin(self):
+        session = {}
+        self.request(session, lambda: self.router.db_for_read(Course))
+        self.assertNotIn(PIN_SESSION_KEY, session)
+
+
+class TestSqliteReplicaCopy(TransactionTestCase):
+    # the backup would wait forever on TestCase's open write transaction
+    def setUp(self):
+        initialize_course_data()
+
+    def test_copy_holds_the_primary_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            replica = sqlite3.connect(os.path.join(directory, 'replica.sqlite3'))
+            connection.ensure_connection()
+            copy_sqlite_database(connection.connection, replica)
+            count, = replica.execute('SELECT COUNT(*) FROM courseinfo_course').fetchone()
+            replica.close()
+        self.assertEqual(count, Course.objects.count())
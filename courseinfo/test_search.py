@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from courseinfo.models import Instructor, Student
+from courseinfo.search import fts_available, search_people
+from courseinfo.test_data_initialize import initialize_instructor_data, initialize_student_data
+
+
+class TestSearchPeople(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_student_data()
+        initialize_instructor_data()
+        Student.objects.create(first_name='Sara', last_name='Sanders', disambiguator='')
+
+    def search(self, q, model=Student):
+        return [str(person) for person in search_people(model.objects.all(), q)]
+
+    def test_matches_name_prefixes_case_insensitively(self):
+        self.assertEqual(self.search('sa'), ['Sanders, Sara', 'Saoji, Saurabh, (UIUC)'])
+        self.assertEqual(self.search('KEV'), ['Trainor, Kevin, (UIUC)'])
+        self.assertEqual(self.search('uiuc'), ['Saoji, Saurabh, (UIUC)', 'Trainor, Kevin, (UIUC)'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('saoji, saur'), ['Saoji, Saurabh, (UIUC)'])
+        self.assertEqual(self.search('saoji kevin'), [])
+
+    def test_blank_query_returns_everything(self):
+        self.assertEqual(len(self.search('  ')), 3)
+
+    def test_instructor_search(self):
+        self.assertEqual(self.search('train', Instructor), ['Trainor, Kevin, (UIUC)'])
+
+    def test_prefix_lookup_uses_index(self):
+        Student.objects.bulk_create(
+            Student(first_name='First%s' % number, last_name='Last%s' % number) for number in range(500)
+        )
+        queryset = search_people(Student.objects.all(), 'sao')
+        with connection.cursor() as cursor:
+            # the planner needs statistics to prefer the expression indexes
+            cursor.execute('ANALYZE')
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('SEARCH courseinfo_student USING INDEX student_last_lower_idx', plan)
+        self.assertIn('SEARCH courseinfo_student USING INDEX student_first_lower_idx', plan)
+        self.assertNotIn('SCAN', plan)
+
+
+@override_settings(COURSEINFO_SEARCH_FTS=True)
+class TestSearchPeopleFts(TestSearchPeople):
+    def setUp(self):
+        if not fts_available():
+            self.skipTest('SQLite FTS5 is not available')
+
+    def test_prefix_lookup_uses_index(self):
+        queryset = search_people(Student.objects.all(), 'sao')
+        self.assertIn('MATCH', str(queryset.query))
+
+    def test_fts_table_follows_updates_and_deletes(self):
+        student = Student.objects.get(last_name='Sanders')
+        student.last_name = 'Wilson'
+        student.save()
+        self.assertEqual(self.search('sanders'), [])
+        self.assertEqual(self.search('wil'), ['Wilson, Sara'])
+        student.delete()
+        self.assertEqual(self.search('wil'), [])
@@ -0,0 +1,216 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from courseinfo import services
+from courseinfo.models import Registration, Section, Student
+from courseinfo.services import ALREADY_REGISTERED, ENROLLED, NO_SUCH_STUDENT, SECTION_FULL, SectionFull, \
+    bulk_enroll, drop, enroll, move
+from courseinfo.test_data_initialize import initialize_registration_data
+from courseinfo.utils import cached_count
+
+
+class TestBulkEnroll(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+        Student.objects.bulk_create(
+            Student(first_name='First%s' % number, last_name='Cohort', disambiguator='') for number in range(300)
+        )
+        cls.section = Section.objects.get(pk=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_enrolls_cohort_in_constant_queries(self):
+        student_ids = list(Student.objects.filter(last_name='Cohort').values_list('pk', flat=True))
+        # savepoint, students, registrations, seats, a nested savepoint around two
+        # inserts (SQLite takes at most 999 parameters, 249 four-column rows) and its
+        # release, touch section and students, release
+        with self.assertNumQueries(11):
+            outcomes = bulk_enroll(self.section, student_ids)
+        self.assertEqual(set(outcomes.values()), {ENROLLED})
+        self.assertEqual(self.section.registrations.count(), 301)
+
+    def test_reports_per_student_outcomes(self):
+        registered = Registration.objects.get(pk=1).student_id
+        new = Student.objects.filter(last_name='Cohort').first().pk
+        outcomes = bulk_enroll(self.section, [new, registered, 999999, new])
+        self.assertEqual(list(outcomes.items()), [
+            (new, ENROLLED),
+            (registered, ALREADY_REGISTERED),
+            (999999, NO_SUCH_STUDENT),
+        ])
+        self.assertTrue(self.section.registrations.filter(student_id=new).exists())
+
+    def test_adjusts_cached_registration_count(self):
+        self.assertEqual(cached_count(Registration.objects.all()), 1)
+        student_ids = list(Student.objects.filter(last_name='Cohort').values_list('pk', flat=True)[:10])
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_enroll(self.section, student_ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(Registration.objects.all()), 11)
+
+    def test_concurrent_registration_is_reported_and_not_counted(self):
+        Section.objects.filter(pk=1).update(capacity=5)
+        student_ids = list(Student.objects.filter(last_name='Cohort').values_list('pk', flat=True)[:3])
+        reserve_seats = services.reserve_seats
+
+        def registered_meanwhile(section_id, seats):
+            # another request registers the second student and takes its seat first
+            Registration.objects.create(section_id=section_id, student_id=student_ids[1])
+            return reserve_seats(section_id, seats)
+
+        self.assertEqual(cached_count(Registration.objects.all()), 1)
+        with mock.patch('courseinfo.services.reserve_seats', side_effect=registered_meanwhile):
+            with self.captureOnCommitCallbacks(execute=True):
+                outcomes = bulk_enroll(self.section, student_ids)
+        self.assertEqual([outcomes[pk] for pk in student_ids], [ENROLLED, ALREADY_REGISTERED, ENROLLED])
+        self.assertEqual(self.section.registrations.count(), 4)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 4)
+        # the two created here plus the one from the other request
+        self.assertEqual(cached_count(Registration.objects.all()), 4)
+
+    def test_stops_at_capacity(self):
+        Section.objects.filter(pk=1).update(capacity=5)
+        student_ids = list(Student.objects.filter(last_name='Cohort').values_list('pk', flat=True)[:10])
+        outcomes = bulk_enroll(self.section, student_ids)
+        self.assertEqual([outcomes[pk] for pk in student_ids], [ENROLLED] * 4 + [SECTION_FULL] * 6)
+        self.assertEqual(self.section.registrations.count(), 5)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 5)
+
+
+class TestEnroll(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_registration_data()
+        Section.objects.filter(pk=1).update(capacity=2)
+        cls.section = Section.objects.get(pk=1)
+        cls.students = [
+            Student.objects.create(first_name='First%s' % number, last_name='Seat', disambiguator='')
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_enroll_takes_a_seat_without_counting(self):
+        # savepoint, conditional update, insert, touch section and student, release
+        with self.assertNumQueries(6):
+            registration = enroll(self.section, self.students[0])
+        self.assertEqual(registration.section, self.section)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 2)
+
+    def test_full_section_is_refused(self):
+        enroll(self.section, self.students[0])
+        with self.assertRaises(SectionFull):
+            enroll(self.section, self.students[1])
+        self.assertEqual(self.section.registrations.count(), 2)
+
+    def test_drop_gives_seat_back(self):
+        registration = enroll(self.section, self.students[0])
+        drop(registration)
+        enroll(self.section, self.students[1])
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 2)
+
+    def test_stale_double_drop_gives_one_seat_back(self):
+        self.assertEqual(cached_count(Registration.objects.all()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            registration = enroll(self.section, self.students[0])
+        stale = Registration.objects.get(pk=registration.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(drop(registration))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertFalse(drop(stale))
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 1)
+        self.assertEqual(cached_count(Registration.objects.all()), 1)
+
+    def test_move_needs_a_seat_in_the_new_section(self):
+        registration = enroll(self.section, self.students[0])
+        other = Section.objects.create(section_name='AL1', semester_id=1, course_id=1, instructor_id=1, capacity=0)
+        registration.section = other
+        with self.assertRaises(SectionFull):
+            move(registration)
+        Section.objects.filter(pk=other.pk).update(capacity=1)
+        move(registration)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 1)
+        self.assertEqual(Section.objects.get(pk=other.pk).enrollment_count, 1)
+
+    def test_plain_model_writes_keep_the_count(self):
+        # what the admin and any other caller outside the services do
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 1)
+        registration = Registration.objects.create(section=self.section, student=self.students[0])
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 2)
+        with self.assertRaises(SectionFull), transaction.atomic():
+            Registration.objects.create(section=self.section, student=self.students[1])
+        other = Section.objects.create(section_name='AL1', semester_id=1, course_id=1, instructor_id=1)
+        registration.section = other
+        registration.save()
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 1)
+        self.assertEqual(Section.objects.get(pk=other.pk).enrollment_count, 1)
+        registration.delete()
+        self.assertEqual(Section.objects.get(pk=other.pk).enrollment_count, 0)
+        Registration.objects.filter(section=self.section).delete()
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 0)
+
+    def test_failed_insert_gives_the_seat_back(self):
+        registration = Registration.objects.get(pk=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Registration.objects.create(section=self.section, student=registration.student)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 1)
+
+    def test_unlimited_section(self):
+        Section.objects.filter(pk=1).update(capacity=None)
+        for student in self.students:
+            enroll(self.section, student)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 3)
+
+
+class TestEnrollConcurrency(TransactionTestCase):
+    capacity = 10
+    requests = 40
+
+    def setUp(self):
+        initialize_registration_data()
+        Section.objects.filter(pk=1).update(capacity=self.capacity)
+        Student.objects.bulk_create(
+            Student(first_name='First%s' % number, last_name='Rush', disambiguator='')
+            for number in range(self.requests)
+        )
+
+    def enroll_with_retry(self, section, student, results):
+        try:
+            while True:
+                try:
+                    enroll(section, student)
+                    results.append(ENROLLED)
+                    return
+                except SectionFull:
+                    results.append(SECTION_FULL)
+                    return
+                except OperationalError:
+                    # the writer lock is busy; the client retries
+                    time.sleep(0.01)
+        finally:
+            connection.close()
+
+    def test_parallel_enrollment_never_over_enrolls(self):
+        results = []
+        section = Section.objects.get(pk=1)
+        threads = [
+            threading.Thread(target=self.enroll_with_retry, args=(section, student, results))
+            for student in Student.objects.filter(last_name='Rush')
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(ENROLLED), self.capacity - 1)
+        self.assertEqual(results.count(SECTION_FULL), self.requests - self.capacity + 1)
+        self.assertEqual(Registration.objects.filter(section_id=1).count(), self.capacity)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, self.capacity)
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from courseinfo.sqlite import PRAGMAS, apply_pragmas, configure_connection
+
+
+def pragma(cursor, name):
+    cursor.execute('PRAGMA %s' % name)
+    return cursor.fetchone()[0]
+
+
+class TestSqlitePragmas(TestCase):
+    def test_pragmas_put_a_database_file_in_wal_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'tuned.sqlite3'), isolation_level=None)
+            apply_pragmas(db.cursor(), PRAGMAS)
+            self.assertEqual(pragma(db.cursor(), 'journal_mode'), 'wal')
+            self.assertEqual(pragma(db.cursor(), 'synchronous'), 1)  # NORMAL
+            self.assertEqual(pragma(db.cursor(), 'busy_timeout'), 5000)
+            db.close()
+
+    @override_settings(COURSEINFO_SQLITE_TUNING=True,
+                       COURSEINFO_SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -1024})
+    def test_new_connections_are_configured(self):
+        configure_connection(sender=connection.__class__, connection=connection)
+        with connection.cursor() as cursor:
+            self.assertEqual(pragma(cursor, 'busy_timeout'), 1234)
+            self.assertEqual(pragma(cursor, 'cache_size'), -1024)
+
+    @override_settings(COURSEINFO_SQLITE_TUNING=False, COURSEINFO_SQLITE_PRAGMAS={'busy_timeout': 4321})
+    def test_tuning_is_off_by_default(self):
+        configure_connection(sender=connection.__class__, connection=connection)
+        with connection.cursor() as cursor:
+            self.assertNotEqual(pragma(cursor, 'busy_timeout'), 4321)
@@ -0,0 +1,104 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.test import TestCase
+
+from courseinfo.models import Student
+from courseinfo.utils import CachedCountPaginator, KeysetPaginator, cached_count
+
+
+def initialize_many_students(count):
+    Student.objects.bulk_create(
+        Student(first_name='First%02d' % number, last_name='Last%02d' % (number // 2), disambiguator='')
+        for number in range(count)
+    )
+
+
+class TestKeysetPaginator(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_many_students(23)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        page = paginator.page()
+        self.assertEqual(list(page), list(Student.objects.all()[:10]))
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_walks_forward_and_back_in_meta_ordering(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        expected = list(Student.objects.all())
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor())
+        third = paginator.page(after=second.next_cursor())
+        self.assertEqual(list(first) + list(second) + list(third), expected)
+        self.assertFalse(third.has_next())
+        self.assertTrue(third.has_previous())
+        back = paginator.page(before=third.previous_cursor())
+        self.assertEqual(list(back), expected[10:20])
+        self.assertTrue(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_seek_does_not_use_offset(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        cursor = paginator.page().next_cursor()
+        with self.assertNumQueries(1) as queries:
+            paginator.page(after=cursor)
+        self.assertNotIn('OFFSET', queries.captured_queries[0]['sql'])
+
+    def test_count_can_be_skipped(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10, count=False)
+        with self.assertNumQueries(0):
+            self.assertIsNone(paginator.count)
+            self.assertIsNone(paginator.num_pages)
+        self.assertEqual(KeysetPaginator(Student.objects.all(), 10).num_pages, 3)
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10)
+        with self.assertRaises(InvalidPage):
+            paginator.page(after='not-a-cursor')
+
+    def test_forged_cursor_values(self):
+        paginator = KeysetPaginator(Student.objects.all(), 10, ordering=['last_name', 'student_id'])
+        for values in ([None, 1], ['Last01', [1]], ['Last01', {'a': 1}], ['Last01', 'one']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            with self.subTest(values=values), self.assertRaises(InvalidPage):
+                paginator.page(after=cursor)
+
+
+class TestCachedCount(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        initialize_many_students(23)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_served_from_cache(self):
+        self.assertEqual(cached_count(Student.objects.all()), 23)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(Student.objects.all()), 23)
+            self.assertEqual(CachedCountPaginator(Student.objects.all(), 10).num_pages, 3)
+
+    def test_signals_adjust_cached_count(self):
+        cached_count(Student.objects.all())
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(first_name='New', last_name='Student', disambiguator='')
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(Student.objects.all()), 24)
+        with self.captureOnCommitCallbacks(execute=True):
+            student.delete()
+            Student.objects.filter(last_name='Last00').delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(Student.objects.all()), 21)
+
+    def test_filtered_queryset_is_counted_in_database(self):
+        cached_count(Student.objects.all())
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_count(Student.objects.filter(last_name='Last00')), 2)
@@ -1,9 +1,16 @@
+import base64
+import json
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from courseinfo.models import Instructor, Course, Semester, Section, Student, Registration
+from courseinfo.models import Instructor, Course, Semester, Section, Student, Registration, Period, Year
 from courseinfo.test_data_initialize import initialize_course_data, initialize_instructor_data, initialize_section_data, \
-    initialize_semester_data, initialize_student_data, initialize_registration_data
+    initialize_semester_data, initialize_student_data, initialize_registration_data, initialize_user_data
 
 
 class TestInstructorView(TestCase):
@@ -372,3 +379,578 @@ class TestRegistrationDetail(TestCase):
         url = reverse('courseinfo_registration_detail_urlpattern', args=[self.registration.pk])
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
+
+
+class RegistrarTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = initialize_user_data()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+
+def add_sections(count):
+    semester = Semester.objects.create(
+        year=Year.objects.create(year=2030),
+        period=Period.objects.create(period_sequence=9, period_name='Winter'),
+    )
+    instructor = Instructor.objects.create(first_name='Kevin', last_name='Trainor', disambiguator='Query')
+    for number in range(count):
+        course = Course.objects.create(course_number='IS%03d' % number, course_name='Query Course %s' % number)
+        Section.objects.create(section_name='AL%s' % number, semester=semester, course=course, instructor=instructor)
+
+
+class TestSectionListQueries(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_section_data()
+
+    def test_section_list_query_count_is_constant(self):
+        url = reverse('courseinfo_section_list_urlpattern')
+        with CaptureQueriesContext(connection) as single_section:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            add_sections(10)
+        # session, user, sections; the count comes from the cache
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(single_section), 4)
+        self.assertEqual(len(response.context['section_list']), 11)
+        self.assertContains(response, 'IS439 - OAG 2022 - Spring')
+
+    def test_instructor_detail_query_count_is_constant(self):
+        instructor = Instructor.objects.get(pk=1)
+        Section.objects.update(instructor=instructor)
+        url = reverse('courseinfo_instructor_detail_urlpattern', args=[instructor.pk])
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            add_sections(10)
+        Section.objects.update(instructor=instructor)
+        with self.assertNumQueries(len(before)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['section_list']), 11)
+
+
+def add_registrations(count):
+    add_sections(count)
+    student = Student.objects.get(pk=1)
+    for number, section in enumerate(Section.objects.filter(semester__year__year=2030)):
+        Registration.objects.create(section=section, student=student)
+        extra = Student.objects.create(first_name='Student%s' % number, last_name='Query', disambiguator='')
+        Registration.objects.create(section=Section.objects.get(pk=1), student=extra)
+
+
+class TestRegistrationQueries(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+
+    def test_registration_list_query_count_is_constant(self):
+        url = reverse('courseinfo_registration_list_urlpattern')
+        add_registrations(10)
+        # session, user, count, registrations
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['registration_list']), 21)
+        self.assertContains(response, 'IS439 - OAG 2022 - Spring / Saoji, Saurabh, (UIUC)')
+
+    def test_registration_detail_query_count(self):
+        url = reverse('courseinfo_registration_detail_urlpattern', args=[1])
+        # session, user, updated_at, registration
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, 'IS439 - OAG 2022 - Spring')
+
+    def test_student_detail_query_count_is_constant(self):
+        url = reverse('courseinfo_student_detail_urlpattern', args=[1])
+        add_registrations(10)
+        # session, user, updated_at, student, registrations
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['registration_list']), 11)
+
+    def test_section_detail_query_count_is_constant(self):
+        url = reverse('courseinfo_section_detail_urlpattern', args=[1])
+        add_registrations(10)
+        # session, user, updated_at, section, registrations
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['registration_list']), 11)
+
+
+class TestKeysetPageLinks(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Student.objects.bulk_create(
+            Student(first_name='First%02d' % number, last_name='Last', disambiguator='') for number in range(30)
+        )
+
+    def test_student_list_emits_cursor_links(self):
+        url = reverse('courseinfo_student_list_urlpattern')
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['student_list']), 25)
+        self.assertIsNone(response.context['first_page_url'])
+        self.assertIsNone(response.context['previous_page_url'])
+        self.assertTrue(response.context['next_page_url'].startswith('?after='))
+        response = self.client.get(url + response.context['next_page_url'])
+        self.assertEqual(len(response.context['student_list']), 5)
+        self.assertContains(response, 'Last, First29')
+        self.assertEqual(response.context['first_page_url'], url)
+        self.assertTrue(response.context['previous_page_url'].startswith('?before='))
+        self.assertIsNone(response.context['next_page_url'])
+        self.assertContains(response, '30 total')
+
+    def test_student_list_rejects_bad_cursor(self):
+        url = reverse('courseinfo_student_list_urlpattern')
+        response = self.client.get(url + '?after=bogus')
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_rejects_forged_cursor(self):
+        cursor = base64.urlsafe_b64encode(json.dumps([None, None, None]).encode()).decode()
+        for name in ('courseinfo_student_list_urlpattern', 'courseinfo_instructor_list_urlpattern'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name) + '?after=' + cursor)
+                self.assertEqual(response.status_code, 404)
+
+    def test_student_list_search_keeps_query_on_page_links(self):
+        Student.objects.create(first_name='Other', last_name='Person', disambiguator='')
+        url = reverse('courseinfo_student_list_urlpattern')
+        response = self.client.get(url + '?q=last')
+        self.assertEqual(len(response.context['student_list']), 25)
+        self.assertNotContains(response, 'Person, Other')
+        self.assertIn('q=last', response.context['next_page_url'])
+        response = self.client.get(url + response.context['next_page_url'])
+        self.assertEqual(len(response.context['student_list']), 5)
+        self.assertEqual(response.context['search_query'], 'last')
+        self.assertEqual(response.context['first_page_url'], '?q=last')
+
+
+class TestListPaginationAndStreaming(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_section_data()
+        add_sections(30)
+
+    def test_section_list_is_paginated(self):
+        url = reverse('courseinfo_section_list_urlpattern')
+        response = self.client.get(url)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(len(response.context['section_list']), 25)
+        self.assertEqual(response.context['next_page_url'], None)
+        self.assertEqual(response.context['last_page_url'], '?page=2')
+        response = self.client.get(url + '?page=2')
+        self.assertEqual(len(response.context['section_list']), 6)
+
+    def test_course_list_is_paginated(self):
+        url = reverse('courseinfo_course_list_urlpattern')
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['course_list']), 25)
+        self.assertContains(response, 'Page 1')
+
+    def test_section_list_streams_every_row(self):
+        url = reverse('courseinfo_section_list_urlpattern')
+        # session, user, sections
+        with self.assertNumQueries(3):
+            response = self.client.get(url + '?stream=1')
+            content = b''.join(response.streaming_content).decode()
+        self.assertTrue(response.streaming)
+        self.assertIn('<h2>Section List</h2>', content)
+        for section in Section.objects.all():
+            self.assertIn('<li><a href="%s">%s</a> <span class="seats">(0 enrolled)</span></li>' % (
+                section.get_absolute_url(), section), content)
+
+
+class TestRegistrationBulkCreate(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+
+    def test_bulk_enroll_reports_outcomes(self):
+        student = Student.objects.create(first_name='New', last_name='Student', disambiguator='')
+        url = reverse('courseinfo_registration_bulk_create_urlpattern')
+        response = self.client.post(url, {'section': 1, 'student_ids': '%s, 1\n424242' % student.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'courseinfo/registration_form_bulk.html')
+        self.assertEqual(list(response.context['outcomes']), [
+            (student.pk, 'enrolled'), (1, 'already registered'), (424242, 'no such student'),
+        ])
+        self.assertTrue(Registration.objects.filter(section_id=1, student=student).exists())
+
+    def test_bulk_enroll_rejects_bad_ids(self):
+        url = reverse('courseinfo_registration_bulk_create_urlpattern')
+        response = self.client.post(url, {'section': 1, 'student_ids': '1, two'})
+        self.assertFormError(response.context['form'], 'student_ids', 'Student IDs must be whole numbers.')
+
+
+class TestRegistrationCreateCapacity(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+        Section.objects.filter(pk=1).update(capacity=1)
+        cls.student = Student.objects.create(first_name='New', last_name='Student', disambiguator='')
+
+    def test_full_section_is_reported(self):
+        url = reverse('courseinfo_registration_create_urlpattern')
+        response = self.client.post(url, {'section': 1, 'student': self.student.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'section', 'This section is full.')
+        self.assertFalse(Registration.objects.filter(student=self.student).exists())
+
+    def test_open_seat_is_taken(self):
+        Section.objects.filter(pk=1).update(capacity=2)
+        url = reverse('courseinfo_registration_create_urlpattern')
+        response = self.client.post(url, {'section': 1, 'student': self.student.pk})
+        registration = Registration.objects.get(student=self.student)
+        self.assertRedirects(response, registration.get_absolute_url())
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 2)
+
+    def test_delete_gives_seat_back(self):
+        url = reverse('courseinfo_registration_delete_urlpattern', args=[1])
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('courseinfo_registration_list_urlpattern'))
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 0)
+
+    def test_update_moves_seat_between_sections(self):
+        Section.objects.filter(pk=1).update(capacity=5)
+        other = Section.objects.create(section_name='AL1', semester_id=1, course_id=1, instructor_id=1, capacity=1)
+        url = reverse('courseinfo_registration_update_urlpattern', args=[1])
+        response = self.client.post(url, {'section': other.pk, 'student': 1})
+        self.assertRedirects(response, Registration.objects.get(pk=1).get_absolute_url())
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 0)
+        self.assertEqual(Section.objects.get(pk=other.pk).enrollment_count, 1)
+        self.client.post(url, {'section': 1, 'student': 1})
+        response = self.client.post(url, {'section': other.pk, 'student': self.student.pk})
+        self.assertRedirects(response, Registration.objects.get(pk=1).get_absolute_url())
+        response = self.client.post(
+            reverse('courseinfo_registration_create_urlpattern'), {'section': other.pk, 'student': 1})
+        self.assertFormError(response.context['form'], 'section', 'This section is full.')
+
+    def test_section_pages_show_seats(self):
+        response = self.client.get(reverse('courseinfo_section_list_urlpattern'))
+        self.assertContains(response, '<span class="seats">(1 / 1 enrolled)</span>')
+        response = self.client.get(reverse('courseinfo_course_detail_urlpattern', args=[1]))
+        self.assertContains(response, '<span class="seats">(1 / 1 enrolled)</span>')
+        response = self.client.get(reverse('courseinfo_section_detail_urlpattern', args=[1]))
+        self.assertContains(response, '<td>1 of 1</td>', html=True)
+
+
+class TestDeleteGuard(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_section_data()
+        Instructor.objects.create(first_name='Free', last_name='Instructor', disambiguator='')
+
+    def test_confirm_path_probes_once(self):
+        instructor = Instructor.objects.get(last_name='Instructor')
+        url = reverse('courseinfo_instructor_delete_urlpattern', args=[instructor.pk])
+        # session, user, instructor, exists
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertTemplateUsed(response, 'courseinfo/instructor_confirm_delete.html')
+        self.assertContains(response, 'Instructor, Free')
+
+    def test_refuse_path_shows_bounded_preview(self):
+        add_sections(30)
+        Section.objects.update(instructor_id=1)
+        url = reverse('courseinfo_instructor_delete_urlpattern', args=[1])
+        # session, user, instructor, exists, preview, count
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertTemplateUsed(response, 'courseinfo/instructor_refuse_delete.html')
+        self.assertEqual(len(response.context['sections']), 25)
+        self.assertEqual(response.context['blocker_count'], 31)
+        self.assertContains(response, '... and 6 more.')
+
+    def test_refuse_path_skips_count_for_short_lists(self):
+        url = reverse('courseinfo_semester_delete_urlpattern', args=[1])
+        # session, user, semester, exists, preview
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertTemplateUsed(response, 'courseinfo/semester_refuse_delete.html')
+        self.assertContains(response, 'IS439 - OAG 2022 - Spring')
+        self.assertNotContains(response, 'more.')
+
+
+class TestAutocomplete(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+        add_registrations(30)
+
+    def test_student_autocomplete(self):
+        url = reverse('courseinfo_student_autocomplete_urlpattern')
+        response = self.client.get(url, {'q': 'query stud'})
+        results = response.json()['results']
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0], {'id': Student.objects.get(first_name='Student0').pk, 'text': 'Query, Student0'})
+        self.assertEqual(self.client.get(url, {'q': ''}).json(), {'results': []})
+
+    def test_section_autocomplete(self):
+        url = reverse('courseinfo_section_autocomplete_urlpattern')
+        response = self.client.get(url, {'q': 'is4'})
+        self.assertEqual(response.json()['results'], [{'id': 1, 'text': 'IS439 - OAG 2022 - Spring'}])
+        response = self.client.get(url, {'q': 'is00 al'})
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_instructor_autocomplete(self):
+        url = reverse('courseinfo_instructor_autocomplete_urlpattern')
+        response = self.client.get(url, {'q': 'sao'})
+        self.assertEqual(response.json()['results'], [{'id': 1, 'text': 'Saoji, Saurabh, (UIUC)'}])
+
+    def test_registration_form_does_not_render_every_choice(self):
+        url = reverse('courseinfo_registration_update_urlpattern', args=[1])
+        # session, user, registration, student label, section label
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, 'data-autocomplete-url="%s"' % reverse('courseinfo_student_autocomplete_urlpattern'))
+        self.assertContains(response, '<option value="1">Saoji, Saurabh, (UIUC)</option>', html=True)
+        self.assertNotContains(response, 'Query, Student0')
+        self.assertContains(response, 'courseinfo/autocomplete.js')
+
+    def test_registration_form_validates_submitted_pks(self):
+        student = Student.objects.create(first_name='New', last_name='Student', disambiguator='')
+        url = reverse('courseinfo_registration_create_urlpattern')
+        response = self.client.post(url, {'section': 1, 'student': 999999})
+        self.assertFormError(
+            response.context['form'], 'student',
+            'Select a valid choice. That choice is not one of the available choices.')
+        response = self.client.post(url, {'section': 1, 'student': student.pk})
+        self.assertEqual(response.status_code, 302)
+
+
+class TestSectionFormOptions(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_section_data()
+        add_sections(5)
+
+    def test_option_lists_are_built_once(self):
+        url = reverse('courseinfo_section_create_urlpattern')
+        # session, user, semesters with year and period, courses
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, '<option value="1">2022 - Spring</option>', html=True)
+        # session, user
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, '<option value="1">2022 - Spring</option>', html=True)
+        self.assertContains(response, '<option value="1">IS439 - Web Development</option>', html=True)
+
+    def test_option_list_follows_period_changes(self):
+        url = reverse('courseinfo_section_create_urlpattern')
+        self.client.get(url)
+        period = Period.objects.get(period_name='Spring')
+        period.period_name = 'Vernal'
+        with self.captureOnCommitCallbacks(execute=True):
+            period.save()
+        response = self.client.get(url)
+        self.assertContains(response, '<option value="1">2022 - Vernal</option>', html=True)
+
+    def test_submitted_semester_is_validated(self):
+        url = reverse('courseinfo_section_create_urlpattern')
+        response = self.client.post(url, {'section_name': 'AL9', 'semester': 999, 'course': 1, 'instructor': 1})
+        self.assertFormError(
+            response.context['form'], 'semester',
+            'Select a valid choice. That choice is not one of the available choices.')
+
+
+def add_group_user(username, group_name, codenames):
+    group, _ = Group.objects.get_or_create(name=group_name)
+    group.permissions.add(*Permission.objects.filter(content_type__app_label='courseinfo', codename__in=codenames))
+    user = User.objects.create_user(username)
+    user.groups.add(group)
+    return user
+
+
+class TestGroupPageCache(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_course_data()
+        viewing = ['view_course', 'view_section']
+        cls.alice = add_group_user('alice', 'page_cache_viewers', viewing)
+        cls.bob = add_group_user('bob', 'page_cache_viewers', viewing)
+        cls.carol = add_group_user('carol', 'page_cache_editors', viewing + ['change_course'])
+
+    def test_users_in_the_same_group_share_the_page(self):
+        url = reverse('courseinfo_course_detail_urlpattern', args=[1])
+        self.client.force_login(self.alice)
+        self.assertContains(self.client.get(url), 'Log Out, alice')
+        self.client.force_login(self.bob)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # only the conditional GET's updated_at lookup
+        self.assertEqual(len([query for query in queries if 'courseinfo_' in query['sql']]), 1)
+        self.assertContains(response, 'Log Out, bob')
+        self.assertNotContains(response, 'alice')
+        self.assertContains(response, 'IS439 - Web Development')
+
+    def test_users_in_other_groups_get_their_own_page(self):
+        url = reverse('courseinfo_course_detail_urlpattern', args=[1])
+        self.client.force_login(self.alice)
+        self.assertNotContains(self.client.get(url), 'Edit Course')
+        self.client.force_login(self.carol)
+        self.assertContains(self.client.get(url), 'Edit Course')
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('courseinfo_course_list_urlpattern')
+        self.client.force_login(self.alice)
+        self.client.get(url)
+        response = self.client.get(url, {'page': 'last'})
+        self.assertIsNotNone(response.context)
+
+    def test_saving_a_model_invalidates_its_pages(self):
+        url = reverse('courseinfo_course_list_urlpattern')
+        self.client.force_login(self.alice)
+        self.assertNotContains(self.client.get(url), 'IS999')
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(course_number='IS999', course_name='Caching')
+        self.assertContains(self.client.get(url), 'IS999 - Caching')
+
+
+class TestConditionalGet(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+        cls.student = Student.objects.create(first_name='Conditional', last_name='Get', disambiguator='')
+
+    def etag(self, urlpattern, pk):
+        return self.client.get(reverse(urlpattern, args=[pk]))['ETag']
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse('courseinfo_section_detail_urlpattern', args=[1])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        # session, user, updated_at
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_is_honoured(self):
+        url = reverse('courseinfo_course_detail_urlpattern', args=[1])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_registration_changes_section_student_and_course_pages(self):
+        pages = [('courseinfo_section_detail_urlpattern', 1),
+                 ('courseinfo_student_detail_urlpattern', self.student.pk),
+                 ('courseinfo_course_detail_urlpattern', 1),
+                 ('courseinfo_semester_detail_urlpattern', 1)]
+        before = [self.etag(*page) for page in pages]
+        Registration.objects.create(section_id=1, student=self.student)
+        after = [self.etag(*page) for page in pages]
+        for page, old, new in zip(pages, before, after):
+            self.assertNotEqual(old, new, page[0])
+
+    def test_renamed_course_changes_registration_pages(self):
+        pages = [('courseinfo_registration_detail_urlpattern', 1),
+                 ('courseinfo_student_detail_urlpattern', Registration.objects.get(pk=1).student_id)]
+        before = [self.etag(*page) for page in pages]
+        course = Course.objects.get(pk=1)
+        course.course_name = 'Web Application Development'
+        course.save()
+        self.assertNotEqual([self.etag(*page) for page in pages], before)
+
+    def test_moved_section_changes_both_courses(self):
+        other = Course.objects.create(course_number='IS998', course_name='Moving')
+        section = Section.objects.create(
+            section_name='ZZ9', semester_id=1, course_id=1, instructor_id=1)
+        before = [self.etag('courseinfo_course_detail_urlpattern', pk) for pk in (1, other.pk)]
+        section.course = other
+        section.save()
+        after = [self.etag('courseinfo_course_detail_urlpattern', pk) for pk in (1, other.pk)]
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+    def test_etag_is_per_user(self):
+        url = reverse('courseinfo_course_detail_urlpattern', args=[1])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_superuser('registrar2'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_object_is_not_found(self):
+        url = reverse('courseinfo_course_detail_urlpattern', args=[999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class TestDetailQueryPlans(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+
+    def test_detail_pages_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite syntax.')
+        for name in ('instructor', 'course', 'semester', 'student', 'section', 'registration'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('courseinfo_%s_detail_urlpattern' % name, args=[1]))
+            self.assertEqual(response.status_code, 200)
+            for query in queries.captured_queries:
+                if not query['sql'].startswith('SELECT') or '"courseinfo_' not in query['sql']:
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    plan = [row[-1] for row in cursor.fetchall()]
+                with self.subTest(page=name, sql=query['sql']):
+                    for step in plan:
+                        # SCAN is a pass over a whole table (or whole index)
+                        self.assertFalse(step.startswith('SCAN'), step)
+                        self.assertNotIn('TEMP B-TREE', step)
+
+
+class TestRegistrationExport(RegistrarTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        initialize_registration_data()
+
+    def export(self, **params):
+        response = self.client.get(reverse('courseinfo_registration_export_urlpattern'), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="registrations.csv"')
+        self.assertEqual(content.splitlines(), [
+            'last_name,first_name,disambiguator,course_number,course_name,section_name,year,period,'
+            'instructor_last_name,instructor_first_name,instructor_disambiguator',
+            'Saoji,Saurabh,UIUC,IS439,Web Development,OAG,2022,Spring,Saoji,Saurabh,UIUC',
+        ])
+
+    def test_jsonl_roster_export(self):
+        response, content = self.export(format='jsonl', section=1)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(content.splitlines()), 1)
+        self.assertEqual(json.loads(content)['last_name'], 'Saoji')
+        self.assertEqual(self.export(format='jsonl', semester=2)[1], '')
+
+    def test_export_rejects_bad_parameters(self):
+        url = reverse('courseinfo_registration_export_urlpattern')
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'course': 'IS439'}).status_code, 400)
+
+    def test_bad_format_is_not_echoed(self):
+        response = self.client.get(reverse('courseinfo_registration_export_urlpattern'),
+                                   {'format': '<script>alert(1)</script>'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertNotIn(b'<script>', response.content)
+        self.assertEqual(response.content, b'format must be one of: csv, jsonl.')
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from courseinfo.models import Registration, Section, Student
+from courseinfo.services import SectionFull, enroll
+from courseinfo.test_data_initialize import initialize_registration_data, initialize_user_data
+from courseinfo.writer import Writer, get_writer, stop_writer, write
+
+
+class TestWriter(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        initialize_registration_data()
+        self.section = Section.objects.get(pk=1)
+        self.students = [
+            Student.objects.create(first_name='First%s' % number, last_name='Queued', disambiguator='')
+            for number in range(20)
+        ]
+        self.writer = Writer(batch_size=50, max_delay=0.2).start()
+
+    def tearDown(self):
+        self.writer.stop()
+
+    def test_queued_writes_are_committed_together(self):
+        futures = [self.writer.submit(enroll, self.section, student) for student in self.students]
+        registrations = [future.result(timeout=10) for future in futures]
+        self.assertEqual([registration.student for registration in registrations], self.students)
+        self.assertEqual(self.writer.calls, 20)
+        self.assertLess(self.writer.batches, 20)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 21)
+
+    def test_failed_write_does_not_sink_its_batch(self):
+        Section.objects.filter(pk=1).update(capacity=2)
+        futures = [self.writer.submit(enroll, self.section, student) for student in self.students[:3]]
+        duplicate = self.writer.submit(enroll, self.section, self.students[0])
+        self.assertEqual(futures[0].result(timeout=10).student, self.students[0])
+        with self.assertRaises(SectionFull):
+            futures[1].result(timeout=10)
+        with self.assertRaises(SectionFull):
+            futures[2].result(timeout=10)
+        with self.assertRaises((IntegrityError, SectionFull)):
+            duplicate.result(timeout=10)
+        self.assertEqual(self.section.registrations.count(), 2)
+        self.assertEqual(Section.objects.get(pk=1).enrollment_count, 2)
+
+    def test_writer_survives_a_failed_batch(self):
+        with mock.patch('courseinfo.writer.close_old_connections', side_effect=RuntimeError('connection lost')):
+            failed = self.writer.submit(enroll, self.section, self.students[0])
+            with self.assertRaisesMessage(RuntimeError, 'connection lost'):
+                failed.result(timeout=10)
+        self.assertEqual(self.writer.submit(enroll, self.section, self.students[0]).result(timeout=10).student,
+                         self.students[0])
+
+    def test_call_times_out_and_is_cancelled(self):
+        idle = Writer(timeout=0.05)
+        with self.assertRaises(TimeoutError):
+            idle.call(enroll, self.section, self.students[0])
+        idle.start()
+        idle.stop()
+        self.assertFalse(self.section.registrations.filter(student=self.students[0]).exists())
+
+
+class TestWriteQueueSetting(TransactionTestCase):
+    databases = '__all__'
+    reset_sequences = True
+
+    def setUp(self):
+        initialize_registration_data()
+        self.user = initialize_user_data()
+        self.student = Student.objects.create(first_name='Via', last_name='Queue', disambiguator='')
+
+    def tearDown(self):
+        stop_writer()
+
+    def test_write_runs_inline_without_the_queue(self):
+        registration = write(enroll, Section.objects.get(pk=1), self.student)
+        self.assertEqual(registration.student, self.student)
+
+    @override_settings(COURSEINFO_WRITE_QUEUE=True)
+    def test_registration_create_goes_through_the_queue(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('courseinfo_registration_create_urlpattern'),
+            {'student': self.student.pk, 'section': 1},
+        )
+        registration = Registration.objects.get(student=self.student)
+        self.assertRedirects(response, registration.get_absolute_url(), fetch_redirect_response=False)
+
+    def test_dead_writer_is_replaced(self):
+        dead = get_writer()
+        dead.stop()
+        queued = dead.submit(enroll, Section.objects.get(pk=1), self.student)
+        replacement = get_writer()
+        self.assertIsNot(replacement, dead)
+        self.assertEqual(queued.result(timeout=10).student, self.student)
+        self.assertIs(get_writer(), replacement)
@@ -3,7 +3,8 @@ from courseinfo.views import InstructorList, SectionList, CourseList, SemesterLi
     RegistrationList, InstructorDetail, SectionDetail, SemesterDetail, CourseDetail, StudentDetail, RegistrationDetail, \
     InstructorCreate, SectionCreate, StudentCreate, CourseCreate, RegistrationCreate, SemesterCreate, InstructorUpdate, \
     SectionUpdate, CourseUpdate, SemesterUpdate, StudentUpdate, RegistrationUpdate, RegistrationDelete, \
-    InstructorDelete, SectionDelete, CourseDelete, SemesterDelete, StudentDelete
+    InstructorDelete, SectionDelete, CourseDelete, SemesterDelete, StudentDelete, RegistrationBulkCreate, \
+    InstructorAutocomplete, SectionAutocomplete, StudentAutocomplete, RegistrationExport, DatabasePoolStats
 
 urlpatterns = [
     path('instructor/', InstructorList.as_view(), name='courseinfo_instructor_list_urlpattern'),
@@ -11,11 +12,13 @@ urlpatterns = [
     path('instructor/create/', InstructorCreate.as_view(), name='courseinfo_instructor_create_urlpattern'),
     path('instructor/<int:pk>/update/', InstructorUpdate.as_view(), name='courseinfo_instructor_update_urlpattern'),
     path('instructor/<int:pk>/delete/', InstructorDelete.as_view(), name='courseinfo_instructor_delete_urlpattern'),
+    path('instructor/autocomplete/', InstructorAutocomplete.as_view(), name='courseinfo_instructor_autocomplete_urlpattern'),
     path('section/', SectionList.as_view(), name='courseinfo_section_list_urlpattern'),
     path('section/<int:pk>/', SectionDetail.as_view(), name='courseinfo_section_detail_urlpattern'),
     path('section/create/', SectionCreate.as_view(), name='courseinfo_section_create_urlpattern'),
     path('section/<int:pk>/update/', SectionUpdate.as_view(), name='courseinfo_section_update_urlpattern'),
     path('section/<int:pk>/delete/', SectionDelete.as_view(), name='courseinfo_section_delete_urlpattern'),
+    path('section/autocomplete/', SectionAutocomplete.as_view(), name='courseinfo_section_autocomplete_urlpattern'),
     path('course/', CourseList.as_view(), name='courseinfo_course_list_urlpattern'),
     path('course/<int:pk>', CourseDetail.as_view(), name='courseinfo_course_detail_urlpattern'),
     path('course/create/', CourseCreate.as_view(), name='courseinfo_course_create_urlpattern'),
@@ -31,9 +34,13 @@ urlpatterns = [
     path('student/create/', StudentCreate.as_view(), name='courseinfo_student_create_urlpattern'),
     path('student/<int:pk>/update/', StudentUpdate.as_view(), name='courseinfo_student_update_urlpattern'),
     path('student/<int:pk>/delete/', StudentDelete.as_view(), name='courseinfo_student_delete_urlpattern'),
+    path('student/autocomplete/', StudentAutocomplete.as_view(), name='courseinfo_student_autocomplete_urlpattern'),
     path('registration/', RegistrationList.as_view(), name='courseinfo_registration_list_urlpattern'),
     path('registration/<int:pk>/', RegistrationDetail.as_view(), name='courseinfo_registration_detail_urlpattern'),
     path('registration/create/', RegistrationCreate.as_view(), name='courseinfo_registration_create_urlpattern'),
+    path('registration/bulk/', RegistrationBulkCreate.as_view(), name='courseinfo_registration_bulk_create_urlpattern'),
+    path('registration/export/', RegistrationExport.as_view(), name='courseinfo_registration_export_urlpattern'),
     path('registration/<int:pk>/update/', RegistrationUpdate.as_view(), name='courseinfo_registration_update_urlpattern'),
     path('registration/<int:pk>/delete/', RegistrationDelete.as_view(), name='courseinfo_registration_delete_urlpattern'),
+    path('database/pool/', DatabasePoolStats.as_view(), name='courseinfo_database_pool_urlpattern'),
 ]
@@ -1,19 +1,274 @@
+import base64
+import binascii
+import hashlib
+import json
+from functools import reduce
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import cached_property
+from django.utils.html import escape, format_html
+from django.utils.http import http_date, quote_etag
+
+from courseinfo.generations import versioned_key
+from courseinfo.search import search_people
+
+
+# Models whose row counts are kept in the cache by courseinfo.signals
+counted_models = set()
+COUNT_CACHE_TIMEOUT = 300
+
+
+def _count_key(model):
+    return 'courseinfo:count:%s' % model._meta.label_lower
+
+
+def cached_count(queryset):
+    """Return queryset.count(), from the cache when it covers the whole table.
+
+    Filtered, sliced or distinct querysets, and models that are not in
+    counted_models, are always counted in the database.
+    """
+    query = queryset.query
+    if (queryset.model not in counted_models
+            or query.where or query.is_sliced or query.distinct):
+        return queryset.count()
+    key = _count_key(queryset.model)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_cached_count(model, delta):
+    try:
+        cache.incr(_count_key(model), delta)
+    except ValueError:
+        # nothing cached yet; the next cached_count() will fill it in
+        pass
+
+
+PAGE_CACHE_TIMEOUT = 600
+
+
+def permission_fingerprint(user):
+    """Hash the user's permission set; users with the same groups share it."""
+    if user.is_active and user.is_superuser:
+        # superusers pass every check, whatever rows auth_permission holds
+        return 'superuser'
+    permissions = '\n'.join(sorted(user.get_all_permissions()))
+    return hashlib.sha1(permissions.encode()).hexdigest()
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator.
+
+    Keyset pages have no page number; they are addressed by the cursor
+    of the row just before (``after``) or just after (``before``) them.
+    """
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Keyset page of %s rows>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0])
+        return None
+
+
+class KeysetPaginator:
+    """Seek pagination over a queryset ordered by a unique key.
+
+    Instead of ``OFFSET n`` every page filters on the ordering values of
+    the last row already shown, so late pages cost the same as the first
+    one. ``ordering`` defaults to the model's ``Meta.ordering`` and must
+    identify a row uniquely. With ``count=False`` the paginator never
+    runs ``COUNT(*)``; ``count`` and ``num_pages`` are then ``None``.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None, count=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = list(ordering or object_list.model._meta.ordering)
+        if not self.ordering:
+            raise ImproperlyConfigured(
+                'KeysetPaginator needs an ordering for %s.' % object_list.model.__name__
+            )
+        self.count_enabled = count
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [reduce(getattr, name.split('__'), obj) for name, _ in self._fields()]
+        data = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (binascii.Error, UnicodeError, ValueError):
+            raise InvalidPage('That cursor is not valid')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidPage('That cursor is not valid')
+        # _seek() cannot compare with NULL, and encode_cursor() never
+        # writes a list or an object
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise InvalidPage('That cursor is not valid')
+        return values
+
+    def _seek(self, values, forward):
+        # (a, b, c) > (x, y, z) expands to
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{'%s__%s' % (name, lookup): value})
+            equal[name] = value
+        return condition
+
+    def _filter(self, cursor, forward):
+        try:
+            return self.object_list.filter(self._seek(self.decode_cursor(cursor), forward))
+        except (TypeError, ValueError):
+            # a value of the wrong type for its field, say text where a number goes
+            raise InvalidPage('That cursor is not valid')
+
+    def page(self, after=None, before=None):
+        if after and before:
+            raise InvalidPage('Use either an after or a before cursor, not both')
+        queryset = self.object_list
+        if before:
+            queryset = self._filter(before, forward=False)
+            rows = list(queryset.order_by(*self._reversed_ordering())[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_previous)
+        if after:
+            queryset = self._filter(after, forward=True)
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page], self, has_next=has_next, has_previous=bool(after))
+
+    @cached_property
+    def count(self):
+        if not self.count_enabled:
+            return None
+        return cached_count(self.object_list)
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, -(-self.count // self.per_page))
+
 
 class PageLinksMixin:
     page_kwarg = 'page'
+    paginator_class = CachedCountPaginator
+    after_kwarg = 'after'
+    before_kwarg = 'before'
+    # Seek on Meta.ordering with ?after=/?before= cursors instead of ?page=
+    keyset_pagination = False
+    # With keyset_pagination, False skips the COUNT(*) query entirely
+    keyset_count = True
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.keyset_pagination:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, count=self.keyset_count)
+        try:
+            page = paginator.page(
+                after=self.request.GET.get(self.after_kwarg),
+                before=self.request.GET.get(self.before_kwarg),
+            )
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def _query_string(self, **params):
+        # keep any other parameters, such as a search, on the page links
+        query = self.request.GET.copy()
+        for kwarg in (self.page_kwarg, self.after_kwarg, self.before_kwarg):
+            query.pop(kwarg, None)
+        for key, value in params.items():
+            query[key] = value
+        return query.urlencode()
 
     def _page_urls(self, page_number):
-        return "?{pkw}={n}".format(
-            pkw=self.page_kwarg,
-            n=page_number)
+        return "?{qs}".format(
+            qs=self._query_string(**{self.page_kwarg: page_number}))
+
+    def _cursor_urls(self, kwarg, cursor):
+        return "?{qs}".format(
+            qs=self._query_string(**{kwarg: cursor}))
 
     def first_page(self, page):
         # don't show on first page
+        if self.keyset_pagination:
+            if page.has_previous():
+                query_string = self._query_string()
+                if query_string:
+                    return "?{qs}".format(qs=query_string)
+                return self.request.path
+            return None
         if page.number > 1:
             return self._page_urls(1)
         return None
 
     def previous_page(self, page):
+        if self.keyset_pagination:
+            cursor = page.previous_cursor()
+            if cursor is not None:
+                return self._cursor_urls(
+                    self.before_kwarg, cursor)
+            return None
         if (page.has_previous()
                 and page.number > 2):
             return self._page_urls(
@@ -21,6 +276,12 @@ class PageLinksMixin:
         return None
 
     def next_page(self, page):
+        if self.keyset_pagination:
+            cursor = page.next_cursor()
+            if cursor is not None:
+                return self._cursor_urls(
+                    self.after_kwarg, cursor)
+            return None
         last_page = page.paginator.num_pages
         if (page.has_next()
                 and page.number < last_page - 1):
@@ -29,6 +290,9 @@ class PageLinksMixin:
         return None
 
     def last_page(self, page):
+        # a keyset page does not know its position
+        if self.keyset_pagination:
+            return None
         last_page = page.paginator.num_pages
         if page.number < last_page:
             return self._page_urls(last_page)
@@ -50,3 +314,213 @@ class PageLinksMixin:
                     self.last_page(page),
             })
         return context
+
+
+class StreamingListMixin:
+    """Render the whole list incrementally when ``?stream=1`` is given.
+
+    The page chrome comes from ``stream_template_name``; the rows are
+    produced one at a time from ``QuerySet.iterator()``, so memory use
+    stays flat however many rows the table holds.
+    """
+    stream_kwarg = 'stream'
+    stream_chunk_size = 2000
+    stream_template_name = 'courseinfo/stream_list.html'
+    stream_marker = '<!-- stream rows -->'
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get(self.stream_kwarg):
+            return self.stream_response()
+        return super().get(request, *args, **kwargs)
+
+    def stream_title(self):
+        return '%s List' % self.model._meta.verbose_name.title()
+
+    def stream_row(self, obj):
+        return format_html(
+            '<li><a href="{}">{}</a></li>\n',
+            obj.get_absolute_url(), obj)
+
+    def stream_rows(self):
+        head, tail = render_to_string(
+            self.stream_template_name,
+            {'stream_title': self.stream_title(),
+             'stream_marker': self.stream_marker},
+            request=self.request,
+        ).split(self.stream_marker)
+        yield head
+        for obj in self.get_queryset().iterator(chunk_size=self.stream_chunk_size):
+            yield self.stream_row(obj)
+        yield tail
+
+    def stream_response(self):
+        return StreamingHttpResponse(self.stream_rows())
+
+
+class GroupCacheMixin:
+    """Cache the rendered page per permission set rather than per user.
+
+    The key combines the full path (query string included), a
+    fingerprint of the user's permissions and the generation of every
+    model in ``cache_models``, so saving or deleting any of them makes
+    the old entries unreachable. The username shown in the page header
+    is kept out of the cached HTML and filled in on every response.
+    """
+    cache_models = ()
+    page_cache_timeout = PAGE_CACHE_TIMEOUT
+    username_marker = '<!-- username -->'
+
+    def get_cache_models(self):
+        if not self.cache_models:
+            raise ImproperlyConfigured('%s is missing cache_models.' % self.__class__.__name__)
+        return self.cache_models
+
+    def get_page_cache_key(self):
+        return versioned_key(
+            'page', self.get_cache_models(),
+            permission_fingerprint(self.request.user), self.request.get_full_path(),
+        )
+
+    def fill_username(self, content):
+        return content.replace(
+            self.username_marker.encode(),
+            escape(self.request.user.get_username()).encode(),
+        )
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_page_cache_key()
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(self.fill_username(content))
+        # extra_context, because the detail views skip DetailView's get_context_data
+        self.extra_context = {**(self.extra_context or {}), 'username_marker': self.username_marker}
+        response = super().get(request, *args, **kwargs)
+        if response.streaming or response.status_code != 200:
+            return response
+        response.render()
+        cache.set(key, response.content, self.page_cache_timeout)
+        response.content = self.fill_username(response.content)
+        return response
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs of a detail page from its updated_at alone.
+
+    One query reads the object's updated_at and, when
+    ``related_updated_at`` names a reverse relation listed on the page,
+    the newest updated_at among those rows. That timestamp, the user and
+    their permissions make the ETag, so If-None-Match and
+    If-Modified-Since get a 304 without loading or rendering anything.
+    """
+    related_updated_at = None
+
+    def get_updated_at(self):
+        queryset = self.model._default_manager.filter(pk=self.kwargs[self.pk_url_kwarg]).order_by()
+        fields = ['updated_at']
+        if self.related_updated_at:
+            queryset = queryset.annotate(related_updated_at=Max('%s__updated_at' % self.related_updated_at))
+            fields.append('related_updated_at')
+        # sliced rather than first(), whose ORDER BY pk would sort the aggregate
+        rows = list(queryset.values_list(*fields)[:1])
+        if not rows:
+            return None
+        return max(timestamp for timestamp in rows[0] if timestamp is not None)
+
+    def get_etag(self, updated_at):
+        user = self.request.user
+        parts = '%s\n%s\n%s' % (updated_at.isoformat(), user.pk, permission_fingerprint(user))
+        return quote_etag(hashlib.sha1(parts.encode()).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        updated_at = self.get_updated_at()
+        if updated_at is None:
+            # no such object; let the view raise its 404
+            return super().get(request, *args, **kwargs)
+        etag = self.get_etag(updated_at)
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # always come back with If-None-Match rather than reuse it unasked
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class PeopleSearchMixin:
+    """Narrow a student or instructor list to the names matching ``?q=``."""
+    search_kwarg = 'q'
+
+    def get_search_query(self):
+        return self.request.GET.get(self.search_kwarg, '').strip()
+
+    def get_queryset(self):
+        return search_people(super().get_queryset(), self.get_search_query())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.get_search_query()
+        return context
+
+
+class DeleteGuardMixin:
+    """Refuse to delete an object while rows in ``blocker_relation`` point at it.
+
+    The confirm path costs a single exists() probe. The refuse path shows
+    at most ``blocker_preview_size`` blockers, fetched with_related(), and
+    only counts the rest when the preview is full.
+    """
+    blocker_relation = None
+    blocker_preview_size = 25
+
+    def get_blockers(self):
+        return getattr(self.object, self.blocker_relation).with_related()
+
+    def get_refuse_template_names(self):
+        return ['%s/%s_refuse_delete.html' % (
+            self.object._meta.app_label, self.object._meta.model_name)]
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        blockers = self.get_blockers()
+        if not blockers.exists():
+            return self.render_to_response(self.get_context_data())
+        preview = list(blockers[:self.blocker_preview_size])
+        if len(preview) < self.blocker_preview_size:
+            blocker_count = len(preview)
+        else:
+            blocker_count = blockers.count()
+        context = self.get_context_data(**{
+            self.blocker_relation: preview,
+            'blocker_count': blocker_count,
+            'blockers_not_shown': blocker_count - len(preview),
+        })
+        return self.response_class(
+            request=request,
+            template=self.get_refuse_template_names(),
+            context=context,
+            using=self.template_engine,
+        )
+
+
+class AutocompleteMixin:
+    """Answer ``?q=`` with a small JSON list of matching objects.
+
+    Subclasses narrow get_queryset() by the query; the response never
+    holds more than ``autocomplete_limit`` results.
+    """
+    autocomplete_kwarg = 'q'
+    autocomplete_limit = 20
+
+    def get_autocomplete_query(self):
+        return self.request.GET.get(self.autocomplete_kwarg, '').strip()
+
+    def get(self, request, *args, **kwargs):
+        results = []
+        if self.get_autocomplete_query():
+            results = [
+                {'id': obj.pk, 'text': str(obj)}
+                for obj in self.get_queryset()[:self.autocomplete_limit]
+            ]
+        return JsonResponse({'results': results})
@@ -1,27 +1,46 @@
-from django.contrib.auth.mixins import PermissionRequiredMixin, LoginRequiredMixin
-from django.shortcuts import render, get_object_or_404
+from django.contrib.auth.mixins import PermissionRequiredMixin, LoginRequiredMixin, UserPassesTestMixin
+from django.db import IntegrityError
+from django.http import HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-
-from courseinfo.forms import InstructorForm, SectionForm, StudentForm, CourseForm, RegistrationForm, SemesterForm
-from courseinfo.models import Instructor, Section, Course, Semester, Student, Registration
-from courseinfo.utils import PageLinksMixin
-
-
-class InstructorList(LoginRequiredMixin, PermissionRequiredMixin, PageLinksMixin, ListView):
+from django.utils.html import format_html
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, View
+
+from courseinfo.exports import FORMATS, REGISTRATION_COLUMNS, REGISTRATION_FILTERS, export_lines, \
+    registration_rows
+from courseinfo.forms import InstructorForm, SectionForm, StudentForm, CourseForm, RegistrationForm, SemesterForm, \
+    BulkRegistrationForm
+from courseinfo.models import Instructor, Section, Course, Semester, Student, Registration, Year, Period
+from courseinfo.pool import pool_stats
+from courseinfo.search import search_sections
+from courseinfo.services import bulk_enroll, enroll, drop, move, SectionFull
+from courseinfo.utils import PageLinksMixin, StreamingListMixin, PeopleSearchMixin, DeleteGuardMixin, \
+    AutocompleteMixin, ConditionalGetMixin, GroupCacheMixin
+from courseinfo.writer import write
+
+# The models each cached page is rendered from
+SEMESTER_MODELS = (Semester, Year, Period)
+SECTION_MODELS = (Section, Course, Instructor, Registration) + SEMESTER_MODELS
+REGISTRATION_MODELS = (Registration, Student, Section, Course) + SEMESTER_MODELS
+
+
+class InstructorList(LoginRequiredMixin, PermissionRequiredMixin, GroupCacheMixin, PeopleSearchMixin, PageLinksMixin, ListView):
     paginate_by = 25
+    keyset_pagination = True
     model = Instructor
     permission_required = 'courseinfo.view_instructor'
+    cache_models = (Instructor,)
 
 
-class InstructorDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class InstructorDetail(LoginRequiredMixin, PermissionRequiredMixin, ConditionalGetMixin, GroupCacheMixin, DetailView):
     model = Instructor
     permission_required = 'courseinfo.view_instructor'
+    cache_models = SECTION_MODELS
+    related_updated_at = 'sections'
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        instructor = self.get_object()
-        section_list = instructor.sections.all()
+        instructor = self.object
+        section_list = instructor.sections.with_related()
         context['section_list'] = section_list
         return context
 
@@ -39,46 +58,46 @@ class InstructorUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     permission_required = 'courseinfo.change_instructor'
 
 
-class InstructorDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class InstructorDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteGuardMixin, DeleteView):
     model = Instructor
     success_url = reverse_lazy('courseinfo_instructor_list_urlpattern')
     permission_required = 'courseinfo.delete_instructor'
+    blocker_relation = 'sections'
+
+
+class InstructorAutocomplete(LoginRequiredMixin, PermissionRequiredMixin, PeopleSearchMixin, AutocompleteMixin, ListView):
+    model = Instructor
+    search_kwarg = AutocompleteMixin.autocomplete_kwarg
+    permission_required = 'courseinfo.view_instructor'
+
 
-    def get(self, request, pk):
-        instructor = get_object_or_404(Instructor, pk=pk)
-        sections = instructor.sections.all()
-        if sections.count() > 0:
-            return render(
-                request,
-                'courseinfo/instructor_refuse_delete.html',
-                {'instructor': instructor,
-                 'sections': sections,
-                 }
-            )
-        else:
-            return render(
-                request,
-                'courseinfo/instructor_confirm_delete.html',
-                {'instructor': instructor}
-            )
-
-
-class SectionList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class SectionList(LoginRequiredMixin, PermissionRequiredMixin, GroupCacheMixin, PageLinksMixin, StreamingListMixin, ListView):
+    paginate_by = 25
     model = Section
+    queryset = Section.objects.with_related()
     permission_required = 'courseinfo.view_section'
+    cache_models = SECTION_MODELS
 
+    def stream_row(self, obj):
+        return format_html(
+            '<li><a href="{}">{}</a> <span class="seats">({}{} enrolled)</span></li>\n',
+            obj.get_absolute_url(), obj, obj.enrollment_count,
+            '' if obj.capacity is None else ' / %s' % obj.capacity)
 
-class SectionDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+
+class SectionDetail(LoginRequiredMixin, PermissionRequiredMixin, ConditionalGetMixin, GroupCacheMixin, DetailView):
     model = Section
+    queryset = Section.objects.with_related()
     permission_required = 'courseinfo.view_section'
+    cache_models = SECTION_MODELS + (Student,)
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        section = self.get_object()
+        section = self.object
         course = section.course
         instructor = section.instructor
         semester = section.semester
-        registration_list = section.registrations.all()
+        registration_list = section.registrations.with_related()
         context['instructor'] = instructor
         context['course'] = course
         context['semester'] = semester
@@ -99,43 +118,40 @@ class SectionUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     permission_required = 'courseinfo.change_section'
 
 
-class SectionDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class SectionDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteGuardMixin, DeleteView):
     model = Section
+    queryset = Section.objects.with_related()
     success_url = reverse_lazy('courseinfo_section_list_urlpattern')
     permission_required = 'courseinfo.delete_section'
+    blocker_relation = 'registrations'
+
 
-    def get(self, request, pk):
-        section = get_object_or_404(Section, pk=pk)
-        registrations = section.registrations.all()
-        if registrations.count() > 0:
-            return render(
-                request,
-                'courseinfo/section_refuse_delete.html',
-                {'section': section,
-                 'registrations': registrations,
-                 }
-            )
-        else:
-            return render(
-                request,
-                'courseinfo/section_confirm_delete.html',
-                {'section': section}
-            )
-
-
-class CourseList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class SectionAutocomplete(LoginRequiredMixin, PermissionRequiredMixin, AutocompleteMixin, ListView):
+    model = Section
+    queryset = Section.objects.with_related()
+    permission_required = 'courseinfo.view_section'
+
+    def get_queryset(self):
+        return search_sections(super().get_queryset(), self.get_autocomplete_query())
+
+
+class CourseList(LoginRequiredMixin, PermissionRequiredMixin, GroupCacheMixin, PageLinksMixin, StreamingListMixin, ListView):
+    paginate_by = 25
     model = Course
     permission_required = 'courseinfo.view_course'
+    cache_models = (Course,)
 
 
-class CourseDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class CourseDetail(LoginRequiredMixin, PermissionRequiredMixin, ConditionalGetMixin, GroupCacheMixin, DetailView):
     model = Course
     permission_required = 'courseinfo.view_course'
+    cache_models = SECTION_MODELS
+    related_updated_at = 'sections'
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        course = self.get_object()
-        section_list = course.sections.all()
+        course = self.object
+        section_list = course.sections.with_related()
         context['section_list'] = section_list
         return context
 
@@ -153,46 +169,31 @@ class CourseUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     permission_required = 'courseinfo.change_course'
 
 
-class CourseDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class CourseDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteGuardMixin, DeleteView):
     model = Course
     success_url = reverse_lazy('courseinfo_course_list_urlpattern')
     permission_required = 'courseinfo.delete_course'
+    blocker_relation = 'sections'
 
-    def get(self, request, pk):
-        course = get_object_or_404(
-            Course,
-            pk=pk
-        )
-        sections = course.sections.all()
-        if sections.count() > 0:
-            return render(
-                request,
-                'courseinfo/course_refuse_delete.html',
-                {'course': course,
-                 'sections': sections,
-                 }
-            )
-        else:
-            return render(
-                request,
-                'courseinfo/course_confirm_delete.html',
-                {'course': course}
-            )
-
-
-class SemesterList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+
+class SemesterList(LoginRequiredMixin, PermissionRequiredMixin, GroupCacheMixin, PageLinksMixin, StreamingListMixin, ListView):
+    paginate_by = 25
     model = Semester
+    queryset = Semester.objects.select_related('year', 'period')
     permission_required = 'courseinfo.view_semester'
+    cache_models = SEMESTER_MODELS
 
 
-class SemesterDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class SemesterDetail(LoginRequiredMixin, PermissionRequiredMixin, ConditionalGetMixin, GroupCacheMixin, DetailView):
     model = Semester
     permission_required = 'courseinfo.view_semester'
+    cache_models = SECTION_MODELS
+    related_updated_at = 'sections'
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        semester = self.get_object()
-        section_list = semester.sections.all()
+        semester = self.object
+        section_list = semester.sections.with_related()
         context['section_list'] = section_list
         context['semester'] = semester
         return context
@@ -211,47 +212,31 @@ class SemesterUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     permission_required = 'courseinfo.change_semester'
 
 
-class SemesterDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class SemesterDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteGuardMixin, DeleteView):
     model = Semester
+    queryset = Semester.objects.select_related('year', 'period')
     success_url = reverse_lazy('courseinfo_semester_list_urlpattern')
     permission_required = 'courseinfo.delete_semester'
+    blocker_relation = 'sections'
 
-    def get(self, request, pk):
-        semester = get_object_or_404(
-            Semester,
-            pk=pk
-        )
-        sections = semester.sections.all()
-        if sections.count() > 0:
-            return render(
-                request,
-                'courseinfo/semester_refuse_delete.html',
-                {'semester': semester,
-                 'sections': sections,
-                 }
-            )
-        else:
-            return render(
-                request,
-                'courseinfo/semester_confirm_delete.html',
-                {'semester': semester}
-            )
-
-
-class StudentList(LoginRequiredMixin, PermissionRequiredMixin, PageLinksMixin, ListView):
+
+class StudentList(LoginRequiredMixin, PermissionRequiredMixin, GroupCacheMixin, PeopleSearchMixin, PageLinksMixin, ListView):
     paginate_by = 25
+    keyset_pagination = True
     model = Student
     permission_required = 'courseinfo.view_student'
+    cache_models = (Student,)
 
 
-class StudentDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class StudentDetail(LoginRequiredMixin, PermissionRequiredMixin, ConditionalGetMixin, GroupCacheMixin, DetailView):
     model = Student
     permission_required = 'courseinfo.view_student'
+    cache_models = REGISTRATION_MODELS
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        student = self.get_object()
-        registration_list = student.registrations.all()
+        student = self.object
+        registration_list = student.registrations.with_related()
         context['registration_list'] = registration_list
         return context
 
@@ -269,45 +254,36 @@ class StudentUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     permission_required = 'courseinfo.change_student'
 
 
-class StudentDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class StudentDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteGuardMixin, DeleteView):
     model = Student
     success_url = reverse_lazy('courseinfo_student_list_urlpattern')
     permission_required = 'courseinfo.delete_student'
+    blocker_relation = 'registrations'
 
-    def get(self, request, pk):
-        student = get_object_or_404(
-            Student,
-            pk=pk
-        )
-        registrations = student.registrations.all()
-        if registrations.count() > 0:
-            return render(
-                request,
-                'courseinfo/student_refuse_delete.html',
-                {'student': student,
-                 'registrations': registrations,
-                 }
-            )
-        else:
-            return render(
-                request,
-                'courseinfo/student_confirm_delete.html',
-                {'student': student}
-            )
-
-
-class RegistrationList(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+
+class StudentAutocomplete(LoginRequiredMixin, PermissionRequiredMixin, PeopleSearchMixin, AutocompleteMixin, ListView):
+    model = Student
+    search_kwarg = AutocompleteMixin.autocomplete_kwarg
+    permission_required = 'courseinfo.view_student'
+
+
+class RegistrationList(LoginRequiredMixin, PermissionRequiredMixin, GroupCacheMixin, PageLinksMixin, StreamingListMixin, ListView):
+    paginate_by = 25
     model = Registration
+    queryset = Registration.objects.with_related()
     permission_required = 'courseinfo.view_registration'
+    cache_models = REGISTRATION_MODELS
 
 
-class RegistrationDetail(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class RegistrationDetail(LoginRequiredMixin, PermissionRequiredMixin, ConditionalGetMixin, GroupCacheMixin, DetailView):
     model = Registration
+    queryset = Registration.objects.with_related()
     permission_required = 'courseinfo.view_registration'
+    cache_models = REGISTRATION_MODELS
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        registration = self.get_object()
+        registration = self.object
         student = registration.student
         section = registration.section
         context['registration'] = registration
@@ -321,6 +297,30 @@ class RegistrationCreate(LoginRequiredMixin, PermissionRequiredMixin, CreateView
     model = Registration
     permission_required = 'courseinfo.add_registration'
 
+    def form_valid(self, form):
+        try:
+            self.object = write(enroll, form.cleaned_data['section'], form.cleaned_data['student'])
+        except SectionFull:
+            form.add_error('section', 'This section is full.')
+            return self.form_invalid(form)
+        except IntegrityError:
+            form.add_error(None, 'This student is already registered for this section.')
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class RegistrationBulkCreate(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+    form_class = BulkRegistrationForm
+    template_name = 'courseinfo/registration_form_bulk.html'
+    permission_required = 'courseinfo.add_registration'
+
+    def form_valid(self, form):
+        section = form.cleaned_data['section']
+        outcomes = write(bulk_enroll, section, form.cleaned_data['student_ids'])
+        return self.render_to_response(
+            self.get_context_data(form=form, section=section, outcomes=outcomes.items())
+        )
+
 
 class RegistrationUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
     form_class = RegistrationForm
@@ -328,8 +328,63 @@ class RegistrationUpdate(LoginRequiredMixin, PermissionRequiredMixin, UpdateView
     template_name = 'courseinfo/registration_form_update.html'
     permission_required = 'courseinfo.change_registration'
 
+    def form_valid(self, form):
+        try:
+            self.object = write(move, form.instance)
+        except SectionFull:
+            form.add_error('section', 'This section is full.')
+            return self.form_invalid(form)
+        except IntegrityError:
+            form.add_error(None, 'This student is already registered for this section.')
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class RegistrationDelete(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
     model = Registration
     success_url = reverse_lazy('courseinfo_registration_list_urlpattern')
     permission_required = 'courseinfo.delete_registration'
+
+    def form_valid(self, form):
+        success_url = self.get_success_url()
+        write(drop, self.object)
+        return HttpResponseRedirect(success_url)
+
+
+class RegistrationExport(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Stream registrations as CSV or JSON Lines.
+
+    ``?format=`` picks csv (the default) or jsonl; ``?semester=``,
+    ``?course=`` and ``?section=`` take a primary key and narrow the
+    export, so a section roster is ``?section=<pk>``.
+    """
+    permission_required = 'courseinfo.view_registration'
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('format', 'csv')
+        if file_format not in FORMATS:
+            return HttpResponseBadRequest(
+                'format must be one of: %s.' % ', '.join(sorted(FORMATS)), content_type='text/plain')
+        filters = {}
+        for name in REGISTRATION_FILTERS:
+            if request.GET.get(name):
+                try:
+                    filters[name] = int(request.GET[name])
+                except ValueError:
+                    return HttpResponseBadRequest('%s must be a number.' % name, content_type='text/plain')
+        response = StreamingHttpResponse(
+            export_lines(file_format, REGISTRATION_COLUMNS, registration_rows(**filters)),
+            content_type=FORMATS[file_format][0],
+        )
+        response['Content-Disposition'] = 'attachment; filename="registrations.%s"' % file_format
+        return response
+
+
+class DatabasePoolStats(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Connection pool metrics of the worker process that serves the request."""
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(pool_stats())
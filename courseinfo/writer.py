@@ -0,0 +1,166 @@
+"""Optional single-writer queue for registration writes.
+
+With COURSEINFO_WRITE_QUEUE on, the registration views hand enroll(),
+bulk_enroll(), move() and drop() to one writer thread per process
+instead of running them in the request thread. The writer takes whatever
+has queued up (at most COURSEINFO_WRITE_BATCH_SIZE calls, waiting at
+most COURSEINFO_WRITE_MAX_DELAY seconds for more) and commits it as a
+single transaction, each call in its own savepoint, so on SQLite one
+write lock and one sync serve the whole batch. The request thread blocks
+until its batch has committed and then gets the call's return value or
+exception, or a TimeoutError after COURSEINFO_WRITE_TIMEOUT seconds.
+
+A batch is only as wide as the process, so pair this with one worker
+process serving many threads.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from courseinfo.replicas import mark_written
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_DELAY = 0.002
+DEFAULT_TIMEOUT = 30
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def queue_enabled():
+    return getattr(settings, 'COURSEINFO_WRITE_QUEUE', False)
+
+
+class Writer:
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, max_delay=DEFAULT_MAX_DELAY, timeout=DEFAULT_TIMEOUT,
+                 pending=None):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.timeout = timeout
+        # a replacement writer takes over the calls queued for a dead one
+        self.queue = pending or queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='courseinfo-writer', daemon=True)
+        self.batches = 0
+        self.calls = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def submit(self, function, *args):
+        """Queue function(*args) and return a Future for its result."""
+        future = Future()
+        self.queue.put((function, args, future))
+        return future
+
+    def call(self, function, *args):
+        """Run function(*args) on the writer thread and return its result.
+
+        Raises TimeoutError if the result is not in within self.timeout
+        seconds. A call the writer has not started by then is cancelled;
+        one it has started may still commit.
+        """
+        future = self.submit(function, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        try:
+            while True:
+                batch = self.next_batch()
+                stopping = batch[-1] is None
+                if stopping:
+                    batch.pop()
+                if batch:
+                    try:
+                        close_old_connections()
+                        self.commit(batch)
+                    except Exception as error:
+                        # fail the batch, not the thread, or every later write() would wait forever
+                        for function, args, future in batch:
+                            if not future.done():
+                                future.set_exception(error)
+                if stopping:
+                    break
+        finally:
+            connection.close()
+
+    def commit(self, batch):
+        # calls that timed out and were cancelled before they started are dropped
+        batch = [(function, args, future) for function, args, future in batch
+                 if future.set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for function, args, future in batch:
+                    try:
+                        # a failed call rolls back to here and the rest still commit
+                        with transaction.atomic():
+                            outcomes.append((future, function(*args), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            # the commit itself failed; nothing in the batch was written
+            for function, args, future in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.calls += len(batch)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.thread.is_alive():
+            _writer = Writer(
+                batch_size=getattr(settings, 'COURSEINFO_WRITE_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                max_delay=getattr(settings, 'COURSEINFO_WRITE_MAX_DELAY', DEFAULT_MAX_DELAY),
+                timeout=getattr(settings, 'COURSEINFO_WRITE_TIMEOUT', DEFAULT_TIMEOUT),
+                pending=_writer.queue if _writer is not None else None,
+            ).start()
+        return _writer
+
+
+def stop_writer():
+    """Finish the queued writes and stop this process's writer thread."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+
+def write(function, *args):
+    """Run a courseinfo.services write, through the writer thread when the queue is on."""
+    if not queue_enabled():
+        return function(*args)
+    result = get_writer().call(function, *args)
+    # the router saw these writes on the writer thread, not in this request
+    mark_written()
+    return result
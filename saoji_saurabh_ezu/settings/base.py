@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # only does anything once COURSEINFO_READ_REPLICAS is set
+    'courseinfo.replicas.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -83,6 +85,9 @@ DATABASES = {
     }
 }
 
+# Sends courseinfo reads to COURSEINFO_READ_REPLICAS, when there are any
+DATABASE_ROUTERS = ['courseinfo.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -3,3 +3,47 @@ from .base import *
 DEBUG = False
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'sssaoji2.pythonanywhere.com',]
+
+# Every worker process must see the same cache: the model generations in
+# courseinfo.generations, and the pages and counts keyed on them, live here.
+# The database backend (after "manage.py createcachetable") works as well.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '../cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+
+# WAL and the other pragmas in courseinfo.sqlite, on every new connection
+COURSEINFO_SQLITE_TUNING = True
+
+if os.environ.get('POSTGRES_DB'):
+    # PostgreSQL through the pooled backend in courseinfo.db_backends
+    # (needs requirements/production.txt). CONN_MAX_AGE stays 0 so each
+    # request hands its connection back to the pool when it finishes.
+    DATABASES['default'] = {
+        'ENGINE': 'courseinfo.db_backends.postgresql_pool',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', ''),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', ''),
+        'PORT': os.environ.get('POSTGRES_PORT', ''),
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                # per worker process; keep workers * max_size under max_connections
+                'max_size': int(os.environ.get('POSTGRES_POOL_SIZE', 10)),
+                'max_lifetime': 1800,
+                'max_idle': 300,
+                'timeout': 10,
+            },
+        },
+    }
+else:
+    # Keep connections (and the per-connection page cache and mmap) open
+    # between requests; health checks replace any that went bad.
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
@@ -0,0 +1,13 @@
+from .development import *
+
+# A read replica stub: a second SQLite file kept current with
+# "manage.py refresh_replica --interval 5".
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / '../db_replica.sqlite3',
+    'TEST': {
+        'MIRROR': 'default',
+    },
+}
+
+COURSEINFO_READ_REPLICAS = ['replica']